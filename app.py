@@ -8,7 +8,8 @@ FIXES: Project isolation, File paths, Syntax errors, Import statements
 
 import eventlet
 eventlet.monkey_patch()
-from flask import Flask, render_template, request, jsonify, send_file, session, send_from_directory
+from eventlet import tpool
+from flask import Flask, render_template, request, jsonify, send_file, session, send_from_directory, Response, stream_with_context
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 import os
@@ -18,16 +19,36 @@ import signal
 import shutil
 import time
 import secrets
+import hashlib
+import zlib
+import tempfile
 from pathlib import Path
 import re
 from datetime import datetime
 import csv
-from werkzeug.utils import secure_filename
+import mimetypes
+from urllib.parse import quote
+from werkzeug.utils import secure_filename as werkzeug_secure_filename
+import queue
 import threading
 import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 import config
 import utils
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; Flask's built-in JSON provider is used instead
+    orjson = None
+
+try:
+    # rcsbapi fetches the RCSB schema on first import; do that once at startup, not inside a request
+    from rcsbapi.data import DataQuery as RcsbDataQuery
+except Exception as e:  # a failed import or schema fetch must not stop the web app from starting
+    print(f"Warning: rcsbapi unavailable, PDB search results will not include detailed metadata: {e}")
+    RcsbDataQuery = None
+
 
 # Configuration
 BASE_DIR = Path(__file__).resolve().parent.parent # Go up one level to the project root
@@ -41,22 +62,106 @@ STRUCTURE_DIR = BASE_DIR / "Structure"
 
 UPLOAD_FOLDER = BASE_DIR / 'input_sequences'
 ALLOWED_EXTENSIONS = {'faa', 'fasta', 'fa'}
+# Copy uploads to disk in 1MB blocks (Werkzeug's default is 16KB) to cut syscalls on large FASTA files
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+# Read/write buffer used when concatenating uploads into combined.faa
+COMBINED_FILE_BUFFER_SIZE = 1024 * 1024
+# Streamed sequence downloads are sent in blocks of roughly this many bytes
+DOWNLOAD_STREAM_BLOCK_SIZE = 256 * 1024
+
+# External REST API calls: (connect, read) timeout and BLAST job polling limits
+HTTP_TIMEOUT = (5, 30)
+BLAST_POLL_MAX_INTERVAL = 30
+BLAST_POLL_MAX_SECONDS = 900
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Define the 21 standard amino acids (including X for unknown)
 STANDARD_AMINO_ACIDS = set("ARNDCEQGHILKMFPSTWYVXUOBZ")
+# Header patterns used for every record during validation and fixing, compiled once
+ILLEGAL_HEADER_CHARS_RE = re.compile(r'[{}[\]/\\!@#$%^*\'":;]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Replacements applied to sequence IDs by the 'illegal_chars_header' fix
+HEADER_ID_FIX_TABLE = str.maketrans({
+    '{': '(', '}': ')', '[': '(', ']': ')',
+    '/': '_', '\\': '_', '!': '_', '@': '_', '#': '_', '$': '_', '%': '_', '^': '_', '*': '_',
+    "'": None, '"': None, ':': '-', ';': '-',
+})
+
+def _build_sequence_fix_table(uppercase, non_standard):
+    """
+    Builds the str.translate table for ASCII sequence lines that applies the
+    'lowercase_sequences' and/or 'non_standard_aas' fixes in a single pass.
+    """
+    table = {}
+    for char in map(chr, range(128)):
+        if non_standard and char.upper() not in STANDARD_AMINO_ACIDS and char != '*':
+            table[char] = 'X'
+        elif uppercase and char != char.upper():
+            table[char] = char.upper()
+    return str.maketrans(table)
+
+# Keyed by (lowercase_sequences, non_standard_aas) fix flags
+SEQUENCE_FIX_TABLES = {
+    flags: _build_sequence_fix_table(*flags) for flags in [(True, False), (False, True), (True, True)]
+}
+
+# Every byte except A-Z, for stripping sequences down to uppercase letters with bytes.translate
+NON_UPPERCASE_BYTES = bytes(c for c in range(256) if not 65 <= c <= 90)
 
 PROJECTS_DIR = WEBAPP_DIR / "projects"
 for directory in [JOBS_DIR, MSA_DIR, PROJECTS_DIR, VALIDATION_TEMP_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# Canonical base paths for the static result routes, resolved once at startup
+MSA_DIR_ABS = os.path.realpath(MSA_DIR)
+STRUCTURE_DIR_ABS = os.path.realpath(STRUCTURE_DIR)
+VALIDATION_TEMP_DIR_ABS = os.path.realpath(VALIDATION_TEMP_DIR)
+
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 app.config['UPLOAD_FOLDER'] = 'input_sequences'
 app.config['MAX_CONTENT_LENGTH'] = 2000 * 1024 * 1024  # 2000MB max file size
+app.config['USE_X_SENDFILE'] = config.XSENDFILE_MODE == 'apache'
+
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """JSON provider backed by orjson, used by every jsonify() call (alignment payloads can be MBs)."""
+
+        # Datetimes are passed through to self.default so they keep Flask's HTTP-date
+        # format instead of orjson's ISO 8601
+        _options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+        def dumps(self, obj, **kwargs):
+            option = self._options
+            if kwargs.get('sort_keys', self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS  # same key order as Flask's default provider
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
+    class OrjsonSocketIOJSON:
+        """json-module stand-in for Socket.IO packets, so job_update emits with full logs use orjson too."""
+
+        @staticmethod
+        def dumps(obj, **kwargs):
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        @staticmethod
+        def loads(s, **kwargs):
+            return orjson.loads(s)
+
+    socketio_json = OrjsonSocketIOJSON
+else:
+    socketio_json = json
 
 # Initialize extensions
 CORS(app)
@@ -64,6 +169,7 @@ socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode='eventlet',
+    json=socketio_json,
     logger=True,
     engineio_logger=True,
     ping_timeout=60, # Keep connection alive
@@ -82,10 +188,82 @@ def request_entity_too_large(error):
 # Store active jobs
 active_jobs = {}
 
+class DaemonJobPool:
+    """
+    Minimal bounded worker pool returning concurrent.futures.Future objects.
+    Unlike ThreadPoolExecutor, whose worker threads are joined at interpreter exit,
+    the workers are daemon threads (like the per-job threads used before), so stopping
+    the server never waits for in-flight jobs. Queued jobs can still be cancelled.
+    """
+    def __init__(self, max_workers, thread_name_prefix):
+        self._queue = queue.SimpleQueue()
+        for i in range(max_workers):
+            threading.Thread(target=self._worker, name=f"{thread_name_prefix}_{i}", daemon=True).start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def _worker(self):
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue  # cancelled while queued
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+# Shared, bounded worker pool for mutational-analysis preparation jobs, so bursts of
+# requests queue up instead of each starting its own thread
+JOB_POOL = DaemonJobPool(max_workers=os.cpu_count() or 4, thread_name_prefix='jobs')
+# Futures of jobs submitted to JOB_POOL, keyed by job_id while queued or running
+job_futures = {}
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
+def terminate_process_tree(proc, timeout=3):
+    """
+    Stops a job subprocess and everything it spawned. Job processes are started with
+    start_new_session=True, so their process group holds all descendants: SIGTERM the
+    group, then SIGKILL it if the main process has not exited within `timeout` seconds.
+    Returns True once the process is gone.
+    """
+    try:
+        pgid = os.getpgid(proc.pid)
+    except ProcessLookupError:
+        return True  # Process already dead
+    if pgid == os.getpgid(0):
+        # Not in its own group (started before start_new_session was used): never signal our own group
+        proc.terminate()
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait(timeout=1)
+        return True
+
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+        proc.wait(timeout=timeout)
+    except ProcessLookupError:
+        return True
+    except subprocess.TimeoutExpired:
+        pass
+    # Children may outlive the main process; make sure the whole group is gone
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    try:
+        proc.wait(timeout=1)
+    except subprocess.TimeoutExpired:
+        return False
+    return True
+
 def format_time(seconds):
     """Format seconds to human-readable time"""
     if seconds < 60:
@@ -99,6 +277,107 @@ def format_time(seconds):
         mins = int((seconds % 3600) // 60)
         return f"{hours}h {mins}m"
 
+def append_fasta_file(src_path, outfiles, chunk_size=COMBINED_FILE_BUFFER_SIZE):
+    """
+    Appends a FASTA file to each of the given binary output files and returns its
+    number of records. Copies in large chunks, normalizing '\\r\\n' line endings as
+    text-mode reads used to, and tells the kernel the source is read sequentially.
+    """
+    count = 0
+    previous_last = b'\n'  # the start of the file counts as a line start
+    pending_cr = b''
+    with open(src_path, 'rb') as infile:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(infile.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while chunk := infile.read(chunk_size):
+            # Hold back a trailing '\r' in case its '\n' starts the next chunk
+            chunk = pending_cr + chunk
+            pending_cr = b''
+            if chunk.endswith(b'\r'):
+                chunk, pending_cr = chunk[:-1], b'\r'
+                if not chunk:
+                    continue
+            chunk = chunk.replace(b'\r\n', b'\n')
+
+            count += chunk.count(b'\n>')
+            if previous_last == b'\n' and chunk[:1] == b'>':
+                count += 1
+            previous_last = chunk[-1:]
+            for outfile in outfiles:
+                outfile.write(chunk)
+    for outfile in outfiles:
+        outfile.write(pending_cr)
+    return count
+
+@lru_cache(maxsize=1024)
+def secure_filename(filename):
+    """Memoized werkzeug secure_filename; upload handlers sanitize the same names several times per file."""
+    return werkzeug_secure_filename(filename)
+
+def dump_json_bytes(obj):
+    """Serializes obj to indented JSON bytes, using orjson when it is installed (several times faster)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2).encode('utf-8')
+
+def load_json_file(path):
+    """Reads and parses a JSON file, using orjson when it is installed."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def is_within_directory(base_dir_abs, relative_path):
+    """
+    Checks that a user-supplied relative path stays inside an already-resolved base
+    directory. A lexical normpath + prefix compare (the same rule as
+    send_from_directory's safe_join) rejects '..' escapes cheaply; paths that pass
+    are then resolved, so a symlink pointing outside the tree is rejected too.
+    """
+    candidate = os.path.normpath(os.path.join(base_dir_abs, relative_path))
+    if not candidate.startswith(base_dir_abs + os.sep):
+        return False
+    return os.path.realpath(candidate).startswith(base_dir_abs + os.sep)
+
+def send_offloaded_file(location, directory, relative_path, as_attachment=False):
+    """
+    Sends a file from one of the result directories. When running behind nginx
+    (config.XSENDFILE_MODE == 'nginx') only an X-Accel-Redirect header is returned
+    so the proxy streams the file; otherwise send_from_directory handles it, which
+    also covers Apache X-Sendfile through app.config['USE_X_SENDFILE'].
+    """
+    if config.XSENDFILE_MODE != 'nginx':
+        return send_from_directory(str(directory), relative_path, as_attachment=as_attachment)
+
+    if not (Path(directory) / relative_path).is_file():
+        return "File not found.", 404
+
+    filename = Path(relative_path).name
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = f"{config.XSENDFILE_INTERNAL_PREFIX}/{location}/{quote(relative_path)}"
+    if as_attachment:
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
+
+_http_client = None
+
+def get_http_client():
+    """
+    Returns a shared requests.Session for the external REST APIs (UniProt, RCSB).
+    Reusing it keeps TCP/TLS connections alive across the submit -> poll -> results
+    calls; idempotent requests are retried on transient 5xx errors.
+    """
+    global _http_client
+    if _http_client is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        client = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+        client.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries))
+        _http_client = client
+    return _http_client
+
 def create_job(job_id, job_type, config):
     """Create a new job entry"""
     # Get current project from session
@@ -128,9 +407,9 @@ def create_job(job_id, job_type, config):
     
     # Save to file
     job_file = JOBS_DIR / f"{job_id}.json"
-    with open(job_file, 'w') as f:
+    with open(job_file, 'wb') as f:
         save_data = {k: v for k, v in job_data.items() if k != 'process'}
-        json.dump(save_data, f, indent=2)
+        f.write(dump_json_bytes(save_data))
     
     active_jobs[job_id] = job_data
     return job_data
@@ -154,9 +433,11 @@ def update_job(job_id, updates):
         # Save to file (exclude process object)
         job_file = JOBS_DIR / f"{job_id}.json"
         try:
-            with open(job_file, 'w') as f: # Exclude non-serializable objects from the file as well
-                save_data = {k: v for k, v in active_jobs[job_id].items() if k not in ['process', 'timeout_timer']}
-                json.dump(save_data, f, indent=2)
+            # Serialize first so a failure cannot leave a truncated job file behind
+            save_data = {k: v for k, v in active_jobs[job_id].items() if k not in ['process', 'timeout_timer']}
+            job_bytes = dump_json_bytes(save_data)
+            with open(job_file, 'wb') as f: # Exclude non-serializable objects from the file as well
+                f.write(job_bytes)
         except Exception as e:
             print(f"Error saving job: {e}")
         
@@ -229,7 +510,8 @@ def run_pipeline_step(job_id, database, config):
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                start_new_session=True # Own process group, so stopping the job also stops BLAST/ClustalW children
             )
             
             def kill_process_timeout(process, job_id, timeout_seconds=7200):
@@ -342,6 +624,75 @@ def run_pipeline_step(job_id, database, config):
     thread.daemon = True
     thread.start()
 
+def _atomic_write_json(path, obj):
+    """
+    Writes JSON to a temp file in the same directory and os.replace()s it over the
+    target, so concurrent readers (e.g. get_project_info polls) never see a torn file.
+    """
+    _atomic_write_bytes(path, dump_json_bytes(obj))
+
+def _atomic_write_bytes(path, data):
+    """Writes bytes to a temp file in the same directory, fsyncs it and os.replace()s it over the target."""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        os.fchmod(fd, utils.DEFAULT_FILE_MODE)  # mkstemp's 0600 would survive os.replace
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+# Parsed project metadata, keyed by project name -> ((mtime_ns, size, ino), metadata dict)
+_project_meta_cache = {}
+_project_meta_locks = {}
+
+def _project_meta_file_key(stat):
+    # The inode changes on every atomic replace, so a rewrite within the mtime
+    # granularity that keeps the size is still noticed
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def project_meta_lock(project_name):
+    """Returns the lock serializing read-modify-write cycles on a project's metadata file."""
+    # dict.setdefault is atomic, so concurrent first calls still share one lock
+    return _project_meta_locks.setdefault(project_name, threading.Lock())
+
+def load_project_meta(project_name):
+    """
+    Returns the parsed metadata for a project, re-reading the file only when its
+    mtime/size/inode changed. The dict is shared with the cache, so callers that modify
+    it must hold project_meta_lock() and persist it with save_project_meta().
+    """
+    project_meta_file = BASE_DIR / 'projects' / f"{project_name}.json"
+    stat = project_meta_file.stat()
+    file_key = _project_meta_file_key(stat)
+
+    cached = _project_meta_cache.get(project_name)
+    if cached and cached[0] == file_key:
+        return cached[1]
+
+    meta_data = load_json_file(project_meta_file)
+    _project_meta_cache[project_name] = (file_key, meta_data)
+    return meta_data
+
+def save_project_meta(project_name, meta_data):
+    """Atomically writes a project's metadata file and refreshes the cached copy."""
+    project_meta_file = BASE_DIR / 'projects' / f"{project_name}.json"
+    try:
+        _atomic_write_json(project_meta_file, meta_data)
+    except Exception:
+        # Drop the (possibly already modified) cached dict so the next load re-reads the file
+        _project_meta_cache.pop(project_name, None)
+        raise
+    stat = project_meta_file.stat()
+    _project_meta_cache[project_name] = (_project_meta_file_key(stat), meta_data)
+
 def _add_protein_to_completion_list(project_name, protein_data):
     """
     Safely appends a protein's data (including errors/warnings) to the project metadata file.
@@ -351,7 +702,7 @@ def _add_protein_to_completion_list(project_name, protein_data):
     if not project_meta_file.exists():
         return  # Cannot update if the project file doesn't exist
 
-    with threading.Lock():
+    with project_meta_lock(project_name):
         try:
             # Read current data
             with open(project_meta_file, 'r') as f:
@@ -367,8 +718,7 @@ def _add_protein_to_completion_list(project_name, protein_data):
             if protein_key not in existing_names:
                 meta_data['completed_mutation_proteins'].append(protein_data)
             # Write updated data back
-            with open(project_meta_file, 'w') as f:
-                json.dump(meta_data, f, indent=2)
+            _atomic_write_json(project_meta_file, meta_data)
 
         except (IOError, json.JSONDecodeError) as e:
             print(f"Error updating project metadata for {project_name}: {e}")
@@ -420,7 +770,8 @@ def run_full_pipeline_thread(job_id, configs, project_name):
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                start_new_session=True # Own process group, so stopping the job also stops BLAST/ClustalW children
             )
             
             # Store process so it can be killed
@@ -495,12 +846,10 @@ def prepare_mutational_analysis_thread(job_id, proteins, project_name):
         # Initialize/clear the completed proteins list in the project metadata
         project_meta_file = BASE_DIR / 'projects' / f"{project_name}.json"
         if project_meta_file.exists():
-            with open(project_meta_file, 'r+') as f:
+            with open(project_meta_file, 'r') as f:
                 meta_data = json.load(f)
-                meta_data['completed_mutation_proteins'] = [] # Start with an empty list
-                f.seek(0)
-                json.dump(meta_data, f, indent=2)
-                f.truncate()
+            meta_data['completed_mutation_proteins'] = [] # Start with an empty list
+            _atomic_write_json(project_meta_file, meta_data)
 
         # Define paths
         project_msa_dir = MSA_DIR / project_name
@@ -552,9 +901,8 @@ def prepare_mutational_analysis_thread(job_id, proteins, project_name):
 
                 # FIX: Match against the canonical protein name (before '=>') to be precise
                 # and avoid incorrect matches from substrings in the description.
-                header_id_part = header.split(' ', 1)[0]
-                full_description = header.split(' ', 1)[1] if ' ' in header else ""
-                canonical_header_name = full_description.split('=>')[0].strip()
+                header_id_part, _, full_description = header.partition(' ')
+                canonical_header_name = full_description.partition('=>')[0].strip()
 
                 # --- NEW: More robust matching. Match if the protein name is either the
                 # canonical name in the description OR the sequence ID itself.
@@ -679,9 +1027,8 @@ def run_alignment_thread(job_id, protein_name, project_name):
                     
                     # --- NEW: More robust matching. Match if the protein name is either the
                     # canonical name in the description OR the sequence ID itself.
-                    header_id_part = header.split(' ', 1)[0]
-                    full_description = header.split(' ', 1)[1] if ' ' in header else ""
-                    canonical_header_name = full_description.split('=>')[0].strip()
+                    header_id_part, _, full_description = header.partition(' ')
+                    canonical_header_name = full_description.partition('=>')[0].strip()
 
                     if protein_name == canonical_header_name or protein_name == header_id_part:
                         variants_found.append(f">{header}\n{seq_data}\n")
@@ -698,8 +1045,7 @@ def run_alignment_thread(job_id, protein_name, project_name):
                 return
 
         # --- NEW: Check sequence count before running alignment ---
-        with open(input_faa, 'r') as f:
-            seq_count = sum(1 for line in f if line.startswith('>'))
+        seq_count = utils.count_fasta_records(input_faa)
         
         if seq_count <= 1:
             add_job_log(job_id, f"Found only {seq_count} sequence(s). Multiple alignment is not possible.", 'warning')
@@ -762,7 +1108,8 @@ def run_alignment_thread(job_id, protein_name, project_name):
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                start_new_session=True # Own process group, so stopping the job also stops BLAST/ClustalW children
             )
             active_jobs[job_id]['process'] = process
         except FileNotFoundError:
@@ -871,8 +1218,7 @@ def _run_alignment_for_protein(protein_name, project_name, job_id_for_logging):
     if not input_faa.is_file():
         raise FileNotFoundError(f"Input variant file not found: {input_faa}")
 
-    with open(input_faa, 'r') as f:
-        seq_count = sum(1 for line in f if line.startswith('>'))
+    seq_count = utils.count_fasta_records(input_faa)
     
     if seq_count <= 1:
         add_job_log(job_id_for_logging, f"Skipping alignment for {protein_name}: Only {seq_count} sequence variant exists.", 'warning')
@@ -981,8 +1327,7 @@ def get_step_results(database, project=None):
         combined_file = output_dir / 'combined.faa'
         if combined_file.exists():
             try:
-                with open(combined_file) as f:
-                    input_count = sum(1 for line in f if line.startswith('>'))
+                input_count = utils.count_fasta_records(combined_file)
                 results['input_sequences'] = input_count
             except Exception:
                 pass
@@ -998,8 +1343,7 @@ def get_step_results(database, project=None):
             prev_file = output_dir / f"{prev_db}_passing.faa"
             if prev_file.exists():
                 try:
-                    with open(prev_file) as f:
-                        input_count = sum(1 for line in f if line.startswith('>'))
+                    input_count = utils.count_fasta_records(prev_file)
                     results['input_sequences'] = input_count
                 except Exception:
                     pass
@@ -1007,7 +1351,7 @@ def get_step_results(database, project=None):
     if passing_file.exists():
         # Count sequences
         try:
-            seq_count = sum(1 for line in open(passing_file) if line.startswith('>'))
+            seq_count = utils.count_fasta_records(passing_file)
             results['passing_sequences'] = seq_count
             results['passing_file'] = str(passing_file.name)
         except Exception:
@@ -1317,8 +1661,7 @@ def get_pipeline_stats():
         combined_file = BASE_DIR / 'input_sequences' / current_project / 'combined.faa'
         if combined_file.exists():
             try:
-                with open(combined_file) as f:
-                    stats['initial_input'] = sum(1 for line in f if line.startswith('>'))
+                stats['initial_input'] = utils.count_fasta_records(combined_file)
             except Exception:
                 pass
         
@@ -1644,8 +1987,12 @@ def validate_and_analyze_fasta(file_path):
                 'line': None, 'content': 'File uses Windows-style line endings (\\r\\n).', 'fixable': True
             })
         
-        content = content_bytes.decode('utf-8', errors='ignore').replace('\r\n', '\n')
+        # Split once and drop the '\r' of '\r\n' per line, instead of copying the whole text with replace()
+        content = content_bytes.decode('utf-8', errors='ignore')
+        content_bytes = None
         lines = content.split('\n')
+        if '\r\n' in content:
+            lines[:-1] = [line[:-1] if line.endswith('\r') else line for line in lines[:-1]]
 
         # MODIFICATION: Check for empty lines throughout the file
         first_empty_line = next((i + 1 for i, line in enumerate(lines) if not line.strip() and i < len(lines) - 1 and lines[i+1].strip()), None)
@@ -1654,7 +2001,10 @@ def validate_and_analyze_fasta(file_path):
                 'line': first_empty_line, 'content': 'Empty line found.', 'fixable': True
             })
         
-        if not content.strip().startswith('>'):
+        # Same as checking content.strip(), without copying the file text
+        content = None
+        first_text = next((line.lstrip() for line in lines if line.strip()), '')
+        if not first_text.startswith('>'):
             results['is_valid'] = False
             results['errors'].setdefault('invalid_start', []).append({
                 'line': 1, 'content': lines[0] if lines else '', 'fixable': False
@@ -1709,7 +2059,7 @@ def validate_and_analyze_fasta(file_path):
 
             # 2. Illegal Characters in Header
             # MODIFICATION: Update regex to find characters that need to be replaced.
-            if re.search(r'[{}[\]/\\!@#$%^*\'":;]', header_id):
+            if ILLEGAL_HEADER_CHARS_RE.search(header_id):
                 results['is_valid'] = False
                 results['warnings'].setdefault('illegal_chars_header', []).append({
                     'line': h_line_num, 'content': header, 'fixable': True
@@ -1774,6 +2124,40 @@ def validate_and_analyze_fasta(file_path):
 
     return results
 
+@lru_cache(maxsize=64)
+def _build_alias_index(passing_file, mtime_ns, size):
+    """
+    Builds the alias lookup for a passing FASTA file: a dict mapping every name in a
+    header's '=>' list to its canonical name, plus (description, canonical) pairs for
+    the substring fallback. Keyed by mtime/size so a rewritten file is re-indexed.
+    """
+    aliases = {}
+    descriptions = []
+    with open(passing_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            if not line.startswith('>'):
+                continue
+
+            first_space = line.find(' ')
+            if first_space == -1:
+                continue
+
+            full_description = line[first_space+1:].strip()
+            # Canonical name comes before the first '=>', aliases are the '=>'-separated rest
+            canonical_name, _, alias_str = full_description.partition('=>')
+            canonical_name = canonical_name.strip()
+            aliases.setdefault(canonical_name, canonical_name)
+            if alias_str:
+                for alias in alias_str.split('=>'):
+                    aliases.setdefault(alias.strip(), canonical_name)
+            descriptions.append((full_description, canonical_name))
+    return aliases, tuple(descriptions)
+
+def get_alias_index(passing_file):
+    """Returns the cached alias index for a passing file, rebuilding it only when the file changes."""
+    stat = passing_file.stat()
+    return _build_alias_index(str(passing_file), stat.st_mtime_ns, stat.st_size)
+
 @app.route('/api/view_alignment_file', methods=['GET'])
 def view_alignment_file():
     """View an alignment file from the project's MSA directory."""
@@ -1801,44 +2185,28 @@ def view_alignment_file():
         found_canonical = None
         found_match_type = None # 'exact', 'substring'
 
+        # Clean up the requested protein name for comparison (remove trailing =)
+        clean_protein_name = protein_name.strip().rstrip('=').strip()
+
         for filename in files_to_check:
             check_file = OUTPUT_DIR / current_proj / filename
             if check_file.is_file():
                 try:
-                    with open(check_file, 'r', encoding='utf-8', errors='ignore') as f:
-                        for line in f:
-                            if not line.startswith('>'):
-                                continue
-                            
-                            first_space = line.find(' ')
-                            if first_space == -1:
-                                continue
-                            
-                            full_description = line[first_space+1:].strip()
-                            # Split by '=>' to get all aliases
-                            parts = [p.strip() for p in full_description.split('=>')]
-                            canonical_name = parts[0]
-                            
-                            # Clean up the requested protein name for comparison (remove trailing =)
-                            clean_protein_name = protein_name.strip().rstrip('=').strip()
-                            
-                            # Check exact match in aliases
-                            if clean_protein_name in parts or protein_name in parts:
-                                 if protein_name != canonical_name:
-                                     found_canonical = canonical_name
-                                     found_match_type = 'exact'
-                                     break # Found exact match, stop searching file
-                            
-                            # Check substring match (fallback)
-                            elif (clean_protein_name in full_description or protein_name in full_description) and found_match_type != 'exact':
-                                 if protein_name != canonical_name:
-                                     found_canonical = canonical_name
-                                     found_match_type = 'substring'
-                                     # Don't break, keep looking for exact match
-                    
-                    if found_match_type == 'exact':
+                    aliases, descriptions = get_alias_index(check_file)
+
+                    # Check exact match in aliases
+                    canonical_name = aliases.get(clean_protein_name) or aliases.get(protein_name)
+                    if canonical_name and protein_name != canonical_name:
+                        found_canonical = canonical_name
+                        found_match_type = 'exact'
                         break # Found exact match, stop searching other files
 
+                    # Check substring match (fallback), keep looking for exact match in other files
+                    for full_description, canonical_name in descriptions:
+                        if (clean_protein_name in full_description or protein_name in full_description) and protein_name != canonical_name:
+                            found_canonical = canonical_name
+                            found_match_type = 'substring'
+
                 except Exception as e:
                     print(f"Error checking for protein aliases in {filename}: {e}")
         
@@ -1861,8 +2229,7 @@ def view_alignment_file():
             }), 404
         
         try:
-            with open(variants_file, 'r', encoding='utf-8', errors='ignore') as f:
-                seq_count = sum(1 for line in f if line.startswith('>'))
+            seq_count = utils.count_fasta_records(variants_file)
             
             if seq_count <= 1:
                 return jsonify({
@@ -1949,8 +2316,8 @@ def download_alignment_file():
     if not filepath.is_file():
         return "Alignment file not found.", 404
 
-    # Use send_from_directory for security and proper header handling
-    return send_from_directory(str(directory), safe_filename, as_attachment=True)
+    # Let the reverse proxy stream the file when configured, else send_from_directory
+    return send_offloaded_file('msa', MSA_DIR, f"{current_proj}/clustal/{safe_protein_name}/{safe_filename}", as_attachment=True)
 
 @app.route('/api/system_info')
 def system_info():
@@ -1976,25 +2343,19 @@ def system_info():
 def serve_msa_results(filepath):
     """Serves files from the MSA directory (e.g., psipred images)."""
     # Security enhancement: Ensure the requested path is within MSA_DIR
-    msa_dir_abs = MSA_DIR.resolve()
-    requested_path = msa_dir_abs.joinpath(filepath).resolve()
-
-    if not requested_path.is_relative_to(msa_dir_abs):
+    if not is_within_directory(MSA_DIR_ABS, filepath):
         return "Access denied", 403
 
-    return send_from_directory(str(msa_dir_abs), filepath)
+    return send_offloaded_file('msa', MSA_DIR_ABS, filepath)
 
 @app.route('/structure_results/<path:filepath>')
 def serve_structure_results(filepath):
     """Serves files from the Structure directory."""
     # Security enhancement: Ensure the requested path is within STRUCTURE_DIR
-    structure_dir_abs = STRUCTURE_DIR.resolve()
-    requested_path = structure_dir_abs.joinpath(filepath).resolve()
-
-    if not requested_path.is_relative_to(structure_dir_abs):
+    if not is_within_directory(STRUCTURE_DIR_ABS, filepath):
         return "Access denied", 403
-        
-    return send_from_directory(str(structure_dir_abs), filepath)
+
+    return send_from_directory(STRUCTURE_DIR_ABS, filepath)
 
     
 @app.route('/api/current_project')
@@ -2009,15 +2370,19 @@ def projects_list():
     projects_dir = BASE_DIR / 'projects'
     projects_dir.mkdir(exist_ok=True)
     
+    with os.scandir(projects_dir) as entries:
+        project_names = [entry.name[:-len('.json')] for entry in entries
+                         if entry.name.endswith('.json') and not entry.name.startswith('.') and entry.is_file()]
+
+    # load_project_meta keeps parsed files keyed by mtime/size, so once warm a listing
+    # costs one stat() per project and only re-parses projects that changed
     projects = []
-    for project_file in projects_dir.glob('*.json'):
+    for project_name in project_names:
         try:
-            with open(project_file) as f:
-                project_data = json.load(f)
-                projects.append(project_data)
+            projects.append(load_project_meta(project_name))
         except Exception as e:
-            print(f"Error loading project {project_file}: {e}")
-    
+            print(f"Error loading project {project_name}: {e}")
+
     # Sort by created_at descending
     projects.sort(key=lambda x: x.get('created_at', ''), reverse=True)
     
@@ -2118,9 +2483,8 @@ def get_project_info(project_name):
         # 1. Get initial input sequence count from the combined file in the input directory
         combined_file = project_input_dir / 'combined.faa'
         if combined_file.exists():
-            with open(combined_file, 'r', encoding='utf-8', errors='ignore') as f:
-                info['input_sequences'] = sum(1 for line in f if line.startswith('>'))
-                info['has_input'] = info['input_sequences'] > 0
+            info['input_sequences'] = utils.count_fasta_records(combined_file)
+            info['has_input'] = info['input_sequences'] > 0
         
         # 2. Get output counts for each completed step from the output directory
         databases = ['human', 'deg', 'vfdb', 'eskape']
@@ -2128,41 +2492,45 @@ def get_project_info(project_name):
             passing_file = project_output_dir / f"{db}_passing.faa"
             if passing_file.exists():
                 try:
-                    with open(passing_file, 'r', encoding='utf-8', errors='ignore') as f:
-                        if db == 'eskape':
-                            # Use a dict to store unique proteins by canonical name
-                            protein_data_map = {}
-                            for line in f:
-                                if line.startswith('>'):
-                                    first_space = line.find(' ')
-                                    if first_space != -1:
-                                        full_description = line[first_space+1:].strip()
-                                        canonical_name = full_description.split('=>')[0].strip()
-                                        # Store both canonical and full display name, preventing duplicates
-                                        if canonical_name not in protein_data_map:
-                                            protein_data_map[canonical_name] = {
-                                                'canonical_name': canonical_name,
-                                                'display_name': full_description
-                                            }
-                            info['eskape_proteins'] = list(protein_data_map.values())
-
-                            f.seek(0) # Reset file pointer
-                            for prot_data in info['eskape_proteins']:
-                                name = prot_data['canonical_name']
-                                safe_name = utils.sanitize_protein_name(name)
-                                aln_file = MSA_DIR / project_name / "clustal" / safe_name / f"{safe_name}_variants.aln"
-                                variant_count = 0
-                                variant_file = MSA_DIR / project_name / "proteins" / f"{safe_name}_variants.faa"
-                                if variant_file.is_file():
-                                    try:
-                                        with open(variant_file, 'r', encoding='utf-8', errors='ignore') as vf:
-                                            variant_count = sum(1 for line in vf if line.startswith('>'))
-                                    except Exception:
-                                        pass
-
-                                info['alignment_status'][name] = {'aligned': aln_file.is_file(), 'variant_count': variant_count}
-                        count = sum(1 for line in f if line.startswith('>'))
-                        info['step_outputs'][db] = count
+                    if db == 'eskape':
+                        # Single pass over the raw bytes: collect every header line once and
+                        # derive both the protein list and the sequence count from it
+                        data = passing_file.read_bytes()
+                        headers = [record.split(b'\n', 1)[0] for record in (b'\n' + data).split(b'\n>')[1:]]
+
+                        # Use a dict to store unique proteins by canonical name
+                        protein_data_map = {}
+                        for header in headers:
+                            line = header.decode('utf-8', errors='ignore')
+                            first_space = line.find(' ')
+                            if first_space != -1:
+                                full_description = line[first_space+1:].strip()
+                                canonical_name = full_description.partition('=>')[0].strip()
+                                # Store both canonical and full display name, preventing duplicates
+                                if canonical_name not in protein_data_map:
+                                    protein_data_map[canonical_name] = {
+                                        'canonical_name': canonical_name,
+                                        'display_name': full_description
+                                    }
+                        info['eskape_proteins'] = list(protein_data_map.values())
+
+                        for prot_data in info['eskape_proteins']:
+                            name = prot_data['canonical_name']
+                            safe_name = utils.sanitize_protein_name(name)
+                            aln_file = MSA_DIR / project_name / "clustal" / safe_name / f"{safe_name}_variants.aln"
+                            variant_count = 0
+                            variant_file = MSA_DIR / project_name / "proteins" / f"{safe_name}_variants.faa"
+                            if variant_file.is_file():
+                                try:
+                                    variant_count = utils.count_fasta_records(variant_file)
+                                except Exception:
+                                    pass
+
+                            info['alignment_status'][name] = {'aligned': aln_file.is_file(), 'variant_count': variant_count}
+                        count = len(headers)
+                    else:
+                        count = utils.count_fasta_records(passing_file)
+                    info['step_outputs'][db] = count
                 except Exception as e:
                     print(f"Could not read passing file for {db} in {project_name}: {e}")
 
@@ -2181,11 +2549,16 @@ def get_project_info(project_name):
 
         # 3.5 NEW: Check for cached PDB search results for structure prediction proteins
         if 'structure_prediction_proteins' in info:
+            # Read the cache directory once instead of stat-ing one file per protein
+            pdb_results_dir = STRUCTURE_DIR / project_name / "pdb_search"
+            try:
+                with os.scandir(pdb_results_dir) as entries:
+                    cached_files = {entry.name for entry in entries if entry.is_file()}
+            except FileNotFoundError:
+                cached_files = set()
             for protein_name in info['structure_prediction_proteins']:
                 safe_protein_name = utils.sanitize_protein_name(protein_name)
-                pdb_results_dir = STRUCTURE_DIR / project_name / "pdb_search"
-                cached_json_filepath = pdb_results_dir / f"pdb_matches_{safe_protein_name}.json"
-                info['pdb_search_status'][protein_name] = cached_json_filepath.is_file()
+                info['pdb_search_status'][protein_name] = f"pdb_matches_{safe_protein_name}.json" in cached_files
 
         # 4. Get mutational analysis preparation job status
         prep_job = get_job_by_type('mutational_prep', project_name)
@@ -2269,12 +2642,17 @@ def cleanup_job(job_id):
             if 'process' in job and job['process']:
                 try:
                     if hasattr(job['process'], 'pid'):
-                        os.killpg(os.getpgid(job['process'].pid), signal.SIGTERM)
+                        terminate_process_tree(job['process'])
                     else:
                         job['process'].terminate()
                 except Exception as e:
                     print(f"Error killing process: {e}")
             
+            # Drop the job from the worker pool queue if it has not started yet
+            future = job_futures.get(job_id)
+            if future is not None:
+                future.cancel()
+
             # Cancel timeout timer
             if 'timeout_timer' in job:
                 try:
@@ -2348,14 +2726,15 @@ def upload_files():
         output_combined_path = project_output_dir / 'combined.faa'
 
         # Open both combined files for writing
-        with open(input_combined_path, 'w') as input_outfile, open(output_combined_path, 'w') as output_outfile:
+        with open(input_combined_path, 'wb', buffering=COMBINED_FILE_BUFFER_SIZE) as input_outfile, \
+                open(output_combined_path, 'wb', buffering=COMBINED_FILE_BUFFER_SIZE) as output_outfile:
             for file in files:
                 if file and file.filename and allowed_file(file.filename):
                     filename = secure_filename(file.filename)
                     filepath = project_input_dir / filename
 
                     # Save the individual file
-                    file.save(filepath)
+                    file.save(filepath, buffer_size=UPLOAD_COPY_BUFFER_SIZE)
 
                     # After saving the file, add validation:
                     valid, message = validate_fasta_content(filepath)
@@ -2368,17 +2747,11 @@ def upload_files():
 
                     # Stream the saved file's content to both combined files
                     # and count sequences at the same time
-                    file_seq_count = 0
-                    with open(filepath, 'r') as infile:
-                        for line in infile:
-                            if line.startswith('>'):
-                                file_seq_count += 1
-                            input_outfile.write(line)
-                            output_outfile.write(line)
+                    file_seq_count = append_fasta_file(filepath, (input_outfile, output_outfile))
 
                     # Ensure a newline at the end
-                    input_outfile.write('\n')
-                    output_outfile.write('\n')
+                    input_outfile.write(b'\n')
+                    output_outfile.write(b'\n')
 
                     total_sequences += file_seq_count
                     uploaded_files_info.append(filename)
@@ -2408,8 +2781,7 @@ def get_initial_sequences():
         combined_file = BASE_DIR / 'input_sequences' / current_project / 'combined.faa'
         
         if combined_file.exists():
-            with open(combined_file) as f:
-                count = sum(1 for line in f if line.startswith('>'))
+            count = utils.count_fasta_records(combined_file)
             return jsonify({'count': count})
             
     except Exception as e:
@@ -2439,28 +2811,9 @@ def end_job(job_id):
             try:
                 proc = job['process']
                 
-                # Get process ID
+                # Stop the whole process group so child processes (e.g. BLAST) don't keep running
                 if hasattr(proc, 'pid'):
-                    pid = proc.pid
-                    
-                    # Try graceful termination
-                    try:
-                        os.kill(pid, signal.SIGTERM)
-                        proc.wait(timeout=3)
-                        terminated = True
-                    except subprocess.TimeoutExpired:
-                        # Force kill if still running
-                        try:
-                            os.kill(pid, signal.SIGKILL)
-                            proc.wait(timeout=1)
-                            terminated = True
-                        except:
-                            pass
-                    except ProcessLookupError:
-                        # Process already dead
-                        terminated = True
-                    except Exception as e:
-                        print(f"Error terminating with signal: {e}")
+                    terminated = terminate_process_tree(proc)
                 else:
                     # Fallback to process methods
                     proc.terminate()
@@ -2519,13 +2872,11 @@ def save_mutation_selection():
     project_meta_file = BASE_DIR / 'projects' / f"{current_proj}.json"
     if not project_meta_file.exists():
         return jsonify({'success': False, 'message': 'Project metadata file not found'}), 404
-    with open(project_meta_file, 'r+') as f:
+    with open(project_meta_file, 'r') as f:
         meta_data = json.load(f)
-        meta_data['mutation_proteins'] = proteins
-        meta_data['last_updated'] = datetime.now().isoformat()
-        f.seek(0)
-        json.dump(meta_data, f, indent=2)
-        f.truncate()
+    meta_data['mutation_proteins'] = proteins
+    meta_data['last_updated'] = datetime.now().isoformat()
+    _atomic_write_json(project_meta_file, meta_data)
 
     # This endpoint now only saves the metadata. The preparation is done in the new endpoint.
     return jsonify({'success': True, 'message': 'Selection saved.'})
@@ -2548,33 +2899,87 @@ def prepare_mutational_analysis():
     project_meta_file = BASE_DIR / 'projects' / f"{current_proj}.json"
     if not project_meta_file.exists():
         return jsonify({'success': False, 'message': 'Project metadata file not found'}), 404
-    with open(project_meta_file, 'r+') as f:
+    with open(project_meta_file, 'r') as f:
         meta_data = json.load(f)
-        meta_data['mutation_proteins'] = proteins
-        meta_data['last_updated'] = datetime.now().isoformat()
-        f.seek(0)
-        json.dump(meta_data, f, indent=2)
-        f.truncate()
-
-    if not current_proj:
-        return jsonify({'success': False, 'message': 'No project selected'}), 400
-
-    data = request.get_json()
-    proteins = data.get('proteins')
-    if not proteins:
-        return jsonify({'success': False, 'message': 'No proteins provided'}), 400
+    meta_data['mutation_proteins'] = proteins
+    meta_data['last_updated'] = datetime.now().isoformat()
+    _atomic_write_json(project_meta_file, meta_data)
 
     job_id = f"mut_prep_{current_proj}_{int(time.time())}"
     job_type = "mutational_prep"
     job_config = {'proteins': [p.get('display_name', p.get('name')) for p in proteins]}
     create_job(job_id, job_type, job_config)
 
-    thread = threading.Thread(target=prepare_mutational_analysis_thread, args=(job_id, proteins, current_proj))
-    thread.daemon = True
-    thread.start()
+    future = JOB_POOL.submit(prepare_mutational_analysis_thread, job_id, proteins, current_proj)
+    job_futures[job_id] = future
+    future.add_done_callback(lambda f: job_futures.pop(job_id, None))
 
     return jsonify({'success': True, 'job_id': job_id, 'message': 'Started mutational analysis preparation job.'})
 
+@lru_cache(maxsize=64)
+def _load_passing_index(passing_file, mtime_ns, size):
+    """
+    Reads the sequence IDs and descriptions (as bytes) of a passing FASTA file in one
+    headers-only pass. Keyed by mtime/size for invalidation.
+    """
+    ids, descriptions = set(), set()
+    for header, _ in utils.iter_fasta_records(passing_file, headers_only=True):
+        header_id, description = utils.split_fasta_header(header)
+        ids.add(header_id)
+        descriptions.add(description)
+    return frozenset(ids), frozenset(descriptions)
+
+def get_passing_ids(passing_file):
+    """Returns the cached set of sequence IDs in a passing file, re-reading it only when the file changes."""
+    stat = passing_file.stat()
+    return _load_passing_index(str(passing_file), stat.st_mtime_ns, stat.st_size)[0]
+
+def get_passing_descriptions(passing_file):
+    """Returns the cached set of record descriptions (protein names) in a passing file."""
+    stat = passing_file.stat()
+    return _load_passing_index(str(passing_file), stat.st_mtime_ns, stat.st_size)[1]
+
+def _stream_selected_records(fasta_path, selected_names_set, names_only, passing_seq_ids=None):
+    """
+    Yields the records of a FASTA file whose description is in selected_names_set (and whose
+    ID is in passing_seq_ids, if given) as bytes, batched into blocks of about
+    DOWNLOAD_STREAM_BLOCK_SIZE. With names_only, yields the newline-separated header lines instead.
+    """
+    block, block_size = [], 0
+    separator = b""
+    # Header-only downloads never need the sequence bodies, so don't copy them out of the read buffer
+    for header, record in utils.iter_fasta_records(fasta_path, headers_only=names_only):
+        header_id, protein_name = utils.split_fasta_header(header)
+        # Condition 1: The protein name must be in the selected list. It is tested first because
+        # the selection rejects most records, so the ID lookup below only runs for candidates.
+        if protein_name not in selected_names_set:
+            continue
+        # Condition 2 (source-file downloads only): the ID must have passed the filter. Downloads
+        # from the passing file itself skip this check, since every record there already passed.
+        if passing_seq_ids is not None and header_id not in passing_seq_ids:
+            continue
+
+        if names_only:
+            record = separator + header.strip()
+            separator = b"\n"
+        block.append(record)
+        block_size += len(record)
+        if block_size >= DOWNLOAD_STREAM_BLOCK_SIZE:
+            yield b"".join(block)
+            block, block_size = [], 0
+
+    if block:
+        yield b"".join(block)
+
+def _gzip_stream(chunks):
+    """Gzip-compresses an iterable of byte chunks incrementally."""
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 @app.route('/api/download_selected_sequences', methods=['POST'])
 def download_selected_sequences():
     """
@@ -2598,111 +3003,50 @@ def download_selected_sequences():
         safe_filename = secure_filename(f"{database}_passing.faa")
         project_output_dir = OUTPUT_DIR / current_proj
         source_filepath = project_output_dir / safe_filename
+        original_input_path = None
 
-        if not source_filepath.is_file():
-            return jsonify({'success': False, 'message': 'Source FASTA file not found'}), 404
+        # Records are matched and emitted as raw bytes; names are encoded once up front so
+        # header slices are compared against a bytes frozenset without any per-record decode
+        selected_names_set = frozenset(name.encode('utf-8') for name in protein_names)
 
         # --- NEW LOGIC: Handle specific source file requests differently ---
         if source_file:
             # 1. Get all sequence IDs that passed the filter stage
-            with open(source_filepath, 'r') as f:
-                passing_seq_ids = {line.strip()[1:].split()[0] for line in f if line.startswith('>')}
+            passing_seq_ids = get_passing_ids(source_filepath)
 
             # 2. Get the path to the original user-uploaded file
             original_input_path = BASE_DIR / 'input_sequences' / current_proj / secure_filename(source_file)
-            if not original_input_path.is_file():
-                return jsonify({'success': False, 'message': f'Original input file {source_file} not found.'}), 404
 
             # 3. Extract sequences from the original file that are in the passing set and match the protein name
-            selected_names_set = set(protein_names)
-            output_lines = []
-            with open(original_input_path, 'r') as f:
-                current_sequence_block = []
-                keep_sequence = False
-                for line in f:
-                    if line.startswith('>'):
-                        # Process the previous block
-                        if keep_sequence:
-                            if names_only:
-                                output_lines.append(current_sequence_block[0].strip())
-                            else:
-                                output_lines.extend(current_sequence_block)
-
-                        # Start a new block
-                        current_sequence_block = [line]
-                        header_id = line.strip()[1:].split()[0]
-                        first_space_index = line.find(' ')
-                        protein_name = line[first_space_index + 1:].strip() if first_space_index != -1 else ""
-                        
-                        # Check if this new block should be kept
-                        keep_sequence = (header_id in passing_seq_ids) and (protein_name in selected_names_set)
-                    
-                    elif keep_sequence:
-                        current_sequence_block.append(line)
-
-                # Process the very last block in the file
-                if keep_sequence:
-                    if names_only:
-                        output_lines.append(current_sequence_block[0].strip())
-                    else:
-                        output_lines.extend(current_sequence_block)
-            
-            content = "\n".join(output_lines) if names_only else "".join(output_lines)
-            content_type = 'text/plain; charset=utf-8' if names_only else 'application/octet-stream'
-            return content, 200, {'Content-Type': content_type}
-
-        # --- Original logic for "all files" download ---
-        # Use a set for efficient lookup
-        selected_names_set = set(protein_names)
-        output_lines = []
-        
-        with open(source_filepath, 'r') as f:
-            current_sequence_lines = []
-            header = None
-            keep_sequence = False
-
-            for line in f:
-                if line.startswith('>'):
-                    # Process the previous sequence block
-                    if header and keep_sequence and not names_only:
-                        output_lines.append(header)
-                        output_lines.extend(current_sequence_lines)
-                    # If only names (headers) are requested, just add the header
-                    elif header and keep_sequence and names_only:
-                        output_lines.append(header.strip())
-
-                    # Start a new sequence block
-                    header = line
-                    current_sequence_lines = []
-                    
-                    # Check if this new sequence should be kept
-                    first_space_index = line.find(' ')
-                    protein_name = line[first_space_index + 1:].strip() if first_space_index != -1 else ""
-                    
-                    # Condition 1: The protein name must be in the selected list
-                    keep_sequence = protein_name in selected_names_set
-                else:
-                    # Only collect sequence lines if we are not in names_only mode
-                    if not names_only:
-                        current_sequence_lines.append(line) # This was the last line of the original code block
-            
-            # Process the very last sequence in the file
-            if header and keep_sequence:
-                if names_only:
-                    output_lines.append(header.strip())
-                else:
-                    output_lines.extend([header] + current_sequence_lines)
-
-        # Join the collected lines and determine the content type
-        if names_only:
-            content = "\n".join(output_lines)
-            content_type = 'text/plain; charset=utf-8'
+            fasta_path = original_input_path
         else:
-            content = "".join(output_lines)
-            content_type = 'application/octet-stream'
-
-        return content, 200, {'Content-Type': content_type}
-
+            # --- Original logic for "all files" download ---
+            passing_seq_ids = None
+            fasta_path = source_filepath
+
+            # Every protein in the file selected: nothing to filter, so send the file as-is
+            # (handed to nginx/Apache when X-Accel-Redirect/X-Sendfile is configured)
+            if not names_only and selected_names_set >= get_passing_descriptions(source_filepath):
+                return send_offloaded_file('output', OUTPUT_DIR, f"{current_proj}/{safe_filename}", as_attachment=True)
+
+        # The body is streamed, so a missing file has to be reported before the response starts
+        os.stat(fasta_path)
+
+        body = _stream_selected_records(fasta_path, selected_names_set, names_only, passing_seq_ids)
+        headers = {'Vary': 'Accept-Encoding'}
+        # FASTA compresses several-fold; level 1 keeps compression far faster than the network
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = _gzip_stream(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        content_type = 'text/plain; charset=utf-8' if names_only else 'application/octet-stream'
+        return Response(stream_with_context(body), content_type=content_type, headers=headers)
+
+    except FileNotFoundError as e:
+        # Missing files surface from the open()/stat() itself rather than a separate existence check
+        if original_input_path is not None and e.filename == str(original_input_path):
+            return jsonify({'success': False, 'message': f'Original input file {source_file} not found.'}), 404
+        return jsonify({'success': False, 'message': 'Source FASTA file not found'}), 404
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -2722,13 +3066,12 @@ def classify_protein():
     if not protein_name:
         return jsonify({'success': False, 'message': 'Missing protein_name'}), 400
 
-    project_meta_file = BASE_DIR / 'projects' / f"{current_proj}.json"
-    if not project_meta_file.exists():
-        return jsonify({'success': False, 'message': 'Project metadata file not found'}), 404
+    with project_meta_lock(current_proj):
+        try:
+            meta_data = load_project_meta(current_proj)
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Project metadata file not found'}), 404
 
-    with open(project_meta_file, 'r+') as f:
-        meta_data = json.load(f)
-        
         # Find the protein in the list of completed proteins
         protein_found = False
         if 'completed_mutation_proteins' in meta_data:
@@ -2737,14 +3080,12 @@ def classify_protein():
                     protein['classification'] = classification
                     protein_found = True
                     break
-        
+
         if not protein_found:
             return jsonify({'success': False, 'message': f'Protein "{protein_name}" not found in project metadata.'}), 404
 
         # Write the updated data back to the file
-        f.seek(0)
-        json.dump(meta_data, f, indent=2)
-        f.truncate()
+        save_project_meta(current_proj, meta_data)
 
     return jsonify({'success': True, 'message': f'Classification for {protein_name} saved.'})
 
@@ -2763,18 +3104,15 @@ def save_structure_selection():
     if protein_names is None:
         return jsonify({'success': False, 'message': 'Missing protein_names data'}), 400
 
-    project_meta_file = BASE_DIR / 'projects' / f"{current_proj}.json"
-    if not project_meta_file.exists():
-        return jsonify({'success': False, 'message': 'Project metadata file not found'}), 404
-
-    with open(project_meta_file, 'r+') as f:
-        meta_data = json.load(f)
+    with project_meta_lock(current_proj):
+        try:
+            meta_data = load_project_meta(current_proj)
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Project metadata file not found'}), 404
         # Save the list of names under a new key
         meta_data['structure_prediction_proteins'] = protein_names
         meta_data['last_updated'] = datetime.now().isoformat()
-        f.seek(0)
-        json.dump(meta_data, f, indent=2)
-        f.truncate()
+        save_project_meta(current_proj, meta_data)
 
     return jsonify({'success': True, 'message': 'Structure prediction selection saved.'})
 
@@ -2796,22 +3134,17 @@ def get_reference_sequence(protein_name):
     # Construct the path to the reference FASTA file
     ref_fasta_path = MSA_DIR / current_proj / "reference" / f"reference_{safe_protein_name}.faa"
 
-    if not ref_fasta_path.is_file():
-        return jsonify({'success': False, 'message': f'Reference sequence file not found for "{protein_name}". Please ensure mutational analysis preparation is complete.'}), 404
-
     try:
-        with open(ref_fasta_path, 'r') as f:
-            lines = f.readlines()
-            # Find the first line that is not a header
-            sequence = ""
-            for line in lines:
-                if not line.startswith('>'):
-                    sequence += line.strip()
-            
-            if not sequence:
-                return jsonify({'success': False, 'message': 'No sequence data found in the reference file.'}), 500
+        # Join all non-header lines in one pass instead of growing a string line by line
+        data = ref_fasta_path.read_bytes()
+        sequence = b''.join(line.strip() for line in data.split(b'\n') if not line.startswith(b'>')).decode('utf-8')
+
+        if not sequence:
+            return jsonify({'success': False, 'message': 'No sequence data found in the reference file.'}), 500
 
         return jsonify({'success': True, 'sequence': sequence})
+    except FileNotFoundError:
+        return jsonify({'success': False, 'message': f'Reference sequence file not found for "{protein_name}". Please ensure mutational analysis preparation is complete.'}), 404
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error reading reference file: {str(e)}'}), 500
 
@@ -2822,8 +3155,8 @@ def uniprot_blast_proxy():
     Takes a sequence, submits it, polls for results, and returns the filtered matches.
     """
     import requests
-    import time
 
+    http = get_http_client()
     data = request.get_json()
     sequence = data.get('sequence')
     identity_threshold = data.get('identity_threshold', 0.9)
@@ -2840,7 +3173,7 @@ def uniprot_blast_proxy():
     }
     try:
         # This endpoint expects urlencoded data
-        submit_response = requests.post(blast_api_url, data=blast_payload)
+        submit_response = http.post(blast_api_url, data=blast_payload, timeout=HTTP_TIMEOUT)
         submit_response.raise_for_status()
         job_id = submit_response.json().get("jobId")
         if not job_id:
@@ -2850,9 +3183,11 @@ def uniprot_blast_proxy():
 
     # --- 2. Poll for Status ---
     status_url = f"https://rest.uniprot.org/blast/status/{job_id}"
+    poll_started = time.monotonic()
+    attempt = 0
     while True:
         try:
-            status_response = requests.get(status_url)
+            status_response = http.get(status_url, timeout=HTTP_TIMEOUT)
             status_response.raise_for_status()
             status = status_response.json().get("jobStatus")
 
@@ -2861,7 +3196,14 @@ def uniprot_blast_proxy():
             elif status in ["ERROR", "FAILURE", "NOT_FOUND"]:
                 return jsonify({'success': False, 'message': f'UniProt job failed with status: {status}'}), 502
             
-            time.sleep(5) # Wait 5 seconds before polling again
+            if time.monotonic() - poll_started > BLAST_POLL_MAX_SECONDS:
+                return jsonify({'success': False, 'message': f'UniProt job {job_id} did not finish within {BLAST_POLL_MAX_SECONDS}s.'}), 504
+
+            # Poll quickly at first (short jobs finish in seconds), then back off.
+            # socketio.sleep yields to the eventlet hub, so a waiting poll only parks
+            # its green thread and does not hold up other requests.
+            socketio.sleep(min(BLAST_POLL_MAX_INTERVAL, 1.5 ** attempt))
+            attempt += 1
 
         except requests.exceptions.RequestException as e:
             return jsonify({'success': False, 'message': f'UniProt status check failed: {e}'}), 502
@@ -2869,7 +3211,7 @@ def uniprot_blast_proxy():
     # --- 3. Get and Filter Results ---
     results_url = f"https://rest.uniprot.org/blast/results/{job_id}"
     try:
-        results_response = requests.get(results_url)
+        results_response = http.get(results_url, timeout=HTTP_TIMEOUT)
         results_response.raise_for_status()
         results = results_response.json().get("results", [])
 
@@ -2889,6 +3231,47 @@ def uniprot_blast_proxy():
     except requests.exceptions.RequestException as e:
         return jsonify({'success': False, 'message': f'UniProt results retrieval failed: {e}'}), 502
 
+# PDB search results shared across proteins and projects, keyed by a hash of the sanitized sequence
+PDB_SHARED_CACHE_DIR = STRUCTURE_DIR / "_shared_pdb_cache"
+
+# Column order of the pdb_metadata_<protein>.csv written by pdb_blast_proxy
+PDB_METADATA_FIELDNAMES = ("PDB_ID", "Title", "Classification", "Organisms", "Expression_System", "Mutations", "Released", "Method", "Resolution_Angstrom")
+
+# Fields requested from the RCSB Data API for each PDB search hit
+PDB_DETAIL_FIELDS = [
+    "entries.rcsb_id", "struct.title", "struct_keywords.pdbx_keywords",
+    "rcsb_accession_info.initial_release_date", "rcsb_entry_info.resolution_combined",
+    "exptl.method", "polymer_entities.rcsb_entity_source_organism.ncbi_scientific_name",
+    "polymer_entities.rcsb_entity_host_organism.ncbi_scientific_name",
+    "polymer_entities.rcsb_polymer_entity_feature_summary.type",
+    "polymer_entities.rcsb_polymer_entity_feature_summary.count",
+]
+
+@lru_cache(maxsize=4096)
+def _fetch_pdb_entry_details_cached(pdb_ids):
+    """
+    Fetches detailed RCSB metadata for a tuple of PDB IDs and returns a tuple of entries.
+    Raises LookupError on an empty response: lru_cache does not store exceptions, so
+    only successful lookups are memoized and a transient RCSB failure is retried next time.
+    """
+    detailed_results = RcsbDataQuery(input_type="entries", input_ids=list(pdb_ids), return_data_list=PDB_DETAIL_FIELDS).exec()
+    entries = ()
+    if detailed_results and "data" in detailed_results:
+        entries = tuple(entry for entry in detailed_results["data"].get("entries") or [] if entry and 'rcsb_id' in entry)
+    if not entries:
+        raise LookupError(f"No RCSB entry details returned for {len(pdb_ids)} IDs")
+    return entries
+
+def fetch_pdb_entry_details(pdb_ids):
+    """
+    Returns the RCSB entries for a tuple of PDB IDs (empty if none came back).
+    PDB entries rarely change, so repeated searches hitting the same IDs are served from memory.
+    """
+    try:
+        return _fetch_pdb_entry_details_cached(pdb_ids)
+    except LookupError:
+        return ()
+
 @app.route('/api/pdb_blast', methods=['POST'])
 def pdb_blast_proxy():
     """
@@ -2908,9 +3291,8 @@ def pdb_blast_proxy():
         return jsonify({'success': False, 'message': 'No sequence provided'}), 400
     
     # --- FIX: Sanitize the sequence to remove non-standard characters ---
-    import re
     original_len = len(sequence)
-    sanitized_sequence = re.sub(r'[^A-Z]', '', sequence.upper())
+    sanitized_sequence = sequence.upper().encode('ascii', 'ignore').translate(None, NON_UPPERCASE_BYTES).decode('ascii')
     if len(sanitized_sequence) < original_len:
         print(f"Warning: Sanitized sequence for PDB search. Original length: {original_len}, New length: {len(sanitized_sequence)}")
     # --- NEW: Check for cached results first ---
@@ -2920,14 +3302,31 @@ def pdb_blast_proxy():
 
     if cached_json_filepath.is_file():
         try:
-            with open(cached_json_filepath, 'r') as f:
-                cached_matches = json.load(f)
+            cached_matches = load_json_file(cached_json_filepath)
             # If file exists and is readable, return its content immediately.
             print(f"Serving PDB search results for '{protein_name}' from cache.")
             return jsonify({'success': True, 'matches': cached_matches})
         except Exception as e:
             # If reading the cache fails, proceed to fetch from the API.
             print(f"Warning: Could not read cached PDB results file, will re-fetch. Error: {e}")
+
+    # --- Shared cache keyed by the sequence itself, so the same sequence under another name/project is not re-queried ---
+    seq_hash = hashlib.blake2b(sanitized_sequence.encode(), digest_size=16).hexdigest()
+    shared_json_filepath = PDB_SHARED_CACHE_DIR / f"{seq_hash}.json"
+
+    if shared_json_filepath.is_file():
+        try:
+            cached_matches = load_json_file(shared_json_filepath)
+            print(f"Serving PDB search results for '{protein_name}' from shared sequence cache.")
+            # Keep the per-protein file so the project's PDB search status and cache route see it
+            try:
+                pdb_results_dir.mkdir(parents=True, exist_ok=True)
+                _atomic_write_json(cached_json_filepath, cached_matches)
+            except Exception as e:
+                print(f"Warning: Could not save PDB search results to file: {e}")
+            return jsonify({'success': True, 'matches': cached_matches})
+        except Exception as e:
+            print(f"Warning: Could not read shared PDB results file, will re-fetch. Error: {e}")
     
     try:
         pdb_api_url = "https://search.rcsb.org/rcsbsearch/v2/query"
@@ -2956,7 +3355,7 @@ def pdb_blast_proxy():
         }
         
         try:
-            response = requests.post(pdb_api_url, json=query)
+            response = get_http_client().post(pdb_api_url, json=query, timeout=HTTP_TIMEOUT)
             # This will raise an HTTPError for bad responses (4xx or 5xx)
             response.raise_for_status()
             # This will raise a JSONDecodeError if the response is not valid JSON
@@ -2979,113 +3378,84 @@ def pdb_blast_proxy():
             # --- MODIFICATION: Augment matches with detailed metadata for the UI ---
             if matches:
                 try:
-                    # Import here to avoid startup crash if RCSB schema fetch fails
-                    from rcsbapi.data import DataQuery as Query
+                    if RcsbDataQuery is None:
+                        raise RuntimeError("rcsbapi is not available")
 
-                    pdb_ids_to_fetch = [match['pdb_id'] for match in matches]
-                    all_detailed_entries = []
+                    # Sorted unique IDs so overlapping hit sets produce the same (cached) chunks
+                    pdb_ids_to_fetch = sorted({match['pdb_id'] for match in matches})
                     
                     # --- FIX: Query PDB API in chunks to prevent timeouts/errors ---
                     chunk_size = 50
-                    for i in range(0, len(pdb_ids_to_fetch), chunk_size):
-                        chunk = pdb_ids_to_fetch[i:i + chunk_size]
-                        detail_query = Query(
-                            input_type="entries", input_ids=chunk,
-                            return_data_list=[
-                                "entries.rcsb_id", "struct.title", "struct_keywords.pdbx_keywords",
-                                "rcsb_accession_info.initial_release_date", "rcsb_entry_info.resolution_combined",
-                                "exptl.method", "polymer_entities.rcsb_entity_source_organism.ncbi_scientific_name",
-                                "polymer_entities.rcsb_entity_host_organism.ncbi_scientific_name",
-                                "polymer_entities.rcsb_polymer_entity_feature_summary.type",
-                                "polymer_entities.rcsb_polymer_entity_feature_summary.count",
-                            ]
-                        )
-                        detailed_results = detail_query.exec()
-                        if detailed_results and "data" in detailed_results and "entries" in detailed_results["data"]:
-                            all_detailed_entries.extend(detailed_results["data"]["entries"])
-                    
+                    chunks = [tuple(pdb_ids_to_fetch[i:i + chunk_size]) for i in range(0, len(pdb_ids_to_fetch), chunk_size)]
+
+                    # The chunks are independent, so fetch them concurrently instead of one round-trip at a time
+                    with ThreadPoolExecutor(max_workers=8) as executor:
+                        chunk_results = list(executor.map(fetch_pdb_entry_details, chunks))
+
                     # Create a lookup map for the detailed results
-                    detailed_data_map = {entry['rcsb_id']: entry for entry in all_detailed_entries if entry and 'rcsb_id' in entry}
+                    detailed_data_map = {entry['rcsb_id']: entry for entries in chunk_results for entry in entries}
 
                 except Exception as e:
                     print(f"Warning: Could not fetch detailed PDB metadata for UI: {e}")
                     detailed_data_map = {} # Ensure it exists even on failure
 
                 # --- FIX: Iterate over the original matches to ensure all are processed ---
+                # A single pass augments the UI matches and builds the CSV rows from the same entry
+                rows = []
                 for match in matches:
                     entry = detailed_data_map.get(match['pdb_id'])
                     if not entry:
                         # If no detailed data, just continue with the basic info we already have.
                         continue
 
-                    # --- Augment the match object with detailed data ---
-                    pe_list_ui = entry.get("polymer_entities") or []
-                    host_orgs_ui, source_orgs_ui, has_mutation_ui = set(), set(), False
-                    for pe in pe_list_ui:
+                    pe_list = entry.get("polymer_entities") or []
+                    host_orgs, source_orgs, has_mutation = set(), set(), False
+                    for pe in pe_list:
                         for host in pe.get("rcsb_entity_host_organism") or []:
-                            if hname := host.get("ncbi_scientific_name"): host_orgs_ui.add(hname)
+                            if hname := host.get("ncbi_scientific_name"): host_orgs.add(hname)
                         for src in pe.get("rcsb_entity_source_organism") or []:
-                            if name := src.get("ncbi_scientific_name"): source_orgs_ui.add(name)
-                        for feat in pe.get("rcsb_polymer_entity_feature_summary") or []:
-                            if feat.get("type") == "mutation" and (feat.get("count") or 0) > 0: has_mutation_ui = True
-                    
-                    # Overwrite initial data with more reliable detailed data
-                    match['title'] = (entry.get("struct") or {}).get("title", "N/A")
-                    match['organism'] = "; ".join(sorted(source_orgs_ui)) if source_orgs_ui else "N/A"
-                    match['resolution'] = (entry.get("rcsb_entry_info") or {}).get("resolution_combined", [None])[0]
-                    match['classification'] = (entry.get("struct_keywords") or {}).get("pdbx_keywords")
-                    match['mutations'] = "Yes" if has_mutation_ui else "No"
-                    match['expression_system'] = "; ".join(sorted(host_orgs_ui)) if host_orgs_ui else "N/A"
-                    match['released'] = (entry.get("rcsb_accession_info") or {}).get("initial_release_date", "N/A")[:10]
-                    match['method'] = "; ".join(sorted({e.get("method") for e in (entry.get("exptl") or []) if e.get("method")})) or "N/A"
-
-                # --- NEW: Integration of detailed metadata fetching script ---
-                if matches:
-                    try:
-                        pdb_ids_to_fetch = [match['pdb_id'] for match in matches]
-
-                        # Flatten the JSON into table rows
-                        rows = []
-                        for match in matches:
-                            entry = detailed_data_map.get(match['pdb_id'])
-                            if not entry: continue # Skip if no detailed entry for this match
-
-                            pe_list = entry.get("polymer_entities") or []
-                            source_orgs, host_orgs, has_mutation = set(), set(), False
-                            for pe in pe_list:
-                                for src in pe.get("rcsb_entity_source_organism") or []:
-                                    if name := src.get("ncbi_scientific_name"): source_orgs.add(name)
-                                for host in pe.get("rcsb_entity_host_organism") or []:
-                                    if hname := host.get("ncbi_scientific_name"): host_orgs.add(hname)
-                                for feat in pe.get("rcsb_polymer_entity_feature_summary") or []:
-                                    if feat.get("type") == "mutation" and (feat.get("count") or 0) > 0: has_mutation = True
-
-                            rows.append({
-                                "PDB_ID": entry.get("rcsb_id"),
-                                "Title": (entry.get("struct") or {}).get("title"),
-                                "Classification": (entry.get("struct_keywords") or {}).get("pdbx_keywords"),
-                                "Organisms": "; ".join(sorted(source_orgs)) if source_orgs else None,
-                                "Expression_System": "; ".join(sorted(host_orgs)) if host_orgs else None,
-                                "Mutations": "Yes" if has_mutation else "No",
-                                "Released": (entry.get("rcsb_accession_info") or {}).get("initial_release_date"),
-                                "Method": "; ".join(sorted({e.get("method") for e in (entry.get("exptl") or []) if e.get("method")})) or None,
-                                "Resolution_Angstrom": (entry.get("rcsb_entry_info") or {}).get("resolution_combined", [None])[0],
-                            })
-
-                        # Write the detailed results to a CSV file
-                        safe_protein_name = utils.sanitize_protein_name(protein_name)
-                        pdb_results_dir = STRUCTURE_DIR / current_proj / "pdb_search"
-                        pdb_results_dir.mkdir(parents=True, exist_ok=True)
-                        csv_filepath = pdb_results_dir / f"pdb_metadata_{safe_protein_name}.csv"
-                        
-                        fieldnames = ["PDB_ID", "Title", "Classification", "Organisms", "Expression_System", "Mutations", "Released", "Method", "Resolution_Angstrom"]
-                        with open(csv_filepath, "w", newline="", encoding="utf-8") as fh:
-                            writer = csv.DictWriter(fh, fieldnames=fieldnames)
-                            writer.writeheader()
-                            writer.writerows(rows)
+                            if name := src.get("ncbi_scientific_name"): source_orgs.add(name)
+                        if not has_mutation:
+                            for feat in pe.get("rcsb_polymer_entity_feature_summary") or []:
+                                if feat.get("type") == "mutation" and (feat.get("count") or 0) > 0:
+                                    has_mutation = True
+                                    break
+
+                    struct = entry.get("struct") or {}
+                    classification = (entry.get("struct_keywords") or {}).get("pdbx_keywords")
+                    accession_info = entry.get("rcsb_accession_info") or {}
+                    resolution = (entry.get("rcsb_entry_info") or {}).get("resolution_combined", [None])[0]
+                    organisms = "; ".join(sorted(source_orgs)) if source_orgs else None
+                    expression_system = "; ".join(sorted(host_orgs)) if host_orgs else None
+                    method = "; ".join(sorted({e.get("method") for e in (entry.get("exptl") or []) if e.get("method")})) or None
+                    mutations = "Yes" if has_mutation else "No"
 
-                    except Exception as e:
-                        print(f"Warning: Could not fetch or save detailed PDB metadata: {e}")
+                    # Overwrite initial data with more reliable detailed data
+                    match['title'] = struct.get("title", "N/A")
+                    match['organism'] = organisms or "N/A"
+                    match['resolution'] = resolution
+                    match['classification'] = classification
+                    match['mutations'] = mutations
+                    match['expression_system'] = expression_system or "N/A"
+                    match['released'] = accession_info.get("initial_release_date", "N/A")[:10]
+                    match['method'] = method or "N/A"
+
+                    # Row values in PDB_METADATA_FIELDNAMES order
+                    rows.append((
+                        entry.get("rcsb_id"), struct.get("title"), classification, organisms, expression_system,
+                        mutations, accession_info.get("initial_release_date"), method, resolution,
+                    ))
+
+                # --- NEW: Write the detailed metadata table to a CSV file ---
+                try:
+                    pdb_results_dir.mkdir(parents=True, exist_ok=True)
+                    csv_filepath = pdb_results_dir / f"pdb_metadata_{safe_protein_name}.csv"
+                    with open(csv_filepath, "w", newline="", encoding="utf-8") as fh:
+                        writer = csv.writer(fh)
+                        writer.writerow(PDB_METADATA_FIELDNAMES)
+                        writer.writerows(rows)
+                except Exception as e:
+                    print(f"Warning: Could not save detailed PDB metadata: {e}")
 
             # Save the results to a JSON file
             try:
@@ -3094,9 +3464,10 @@ def pdb_blast_proxy():
                 pdb_results_dir.mkdir(parents=True, exist_ok=True)
                 
                 output_filepath = pdb_results_dir / f"pdb_matches_{safe_protein_name}.json"
-                
-                with open(output_filepath, 'w') as f:
-                    json.dump(matches, f, indent=2)
+                _atomic_write_json(output_filepath, matches)
+
+                PDB_SHARED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                _atomic_write_json(shared_json_filepath, matches)
 
             except Exception as e:
                 print(f"Warning: Could not save PDB search results to file: {e}")
@@ -3149,7 +3520,7 @@ def validate_input_files():
 
         try:
             temp_path = temp_dir / secure_filename(file.filename)
-            file.save(temp_path)
+            file.save(temp_path, buffer_size=UPLOAD_COPY_BUFFER_SIZE)
 
             analysis = validate_and_analyze_fasta(temp_path)
             validation_results.append({
@@ -3178,6 +3549,133 @@ def validate_input_files():
         'validation_session_id': validation_session_id
     })
 
+def _iter_fasta_text_records(f_in):
+    """
+    Yields (header_line, sequence_lines) for each record of a FASTA file opened in text
+    mode, one record at a time. Lines before the first header are skipped.
+    """
+    header, seq_lines = None, []
+    for line in f_in:
+        line = line.rstrip('\n')
+        if line.startswith('>'):
+            if header is not None:
+                yield header, seq_lines
+            header, seq_lines = line, []
+        elif header is not None:
+            seq_lines.append(line)
+    if header is not None:
+        yield header, seq_lines
+
+def iter_fixed_fasta_lines(f_in, active_fixes):
+    """
+    Applies the fixes selected on the validation page to a FASTA file in a single
+    streaming pass and yields the fixed output lines. Only one record is held in
+    memory at a time. 'windows_endings' needs no work here: text-mode reads
+    already turn '\\r\\n' into '\\n'.
+    """
+    seen_ids = set()
+    next_suffix = {}
+    internal_stop_fix = 'internal_stop_codon' in active_fixes
+    terminal_stop_fix = 'terminal_stop_codon' in active_fixes
+    check_stops = internal_stop_fix or terminal_stop_fix
+    uppercase_fix = 'lowercase_sequences' in active_fixes
+    non_standard_fix = 'non_standard_aas' in active_fixes
+    seq_table = SEQUENCE_FIX_TABLES.get((uppercase_fix, non_standard_fix))
+    for header, seq_lines in _iter_fasta_text_records(f_in):
+        # NEW: Fix for empty lines (whitespace-only lines; truly empty lines are dropped below)
+        if 'empty_lines' in active_fixes:
+            seq_lines = [line for line in seq_lines if line.strip() or line == '']
+
+        # Unwrapper should run first
+        if 'multiline_wrapping' in active_fixes:
+            seq_data = ''.join(seq_lines)
+            if not header[1:].strip() and not seq_data.strip():
+                continue
+            seq_lines = [seq_data]
+
+        header_id, *desc = header[1:].split(' ', 1)
+        if 'illegal_chars_header' in active_fixes:
+            # MODIFICATION: Apply the new, more specific replacement rules (one translate pass).
+            header_id = header_id.translate(HEADER_ID_FIX_TABLE)
+            # Clean up multiple spaces that might result from replacements
+            header_id = WHITESPACE_RE.sub(' ', header_id).strip()
+
+        if 'duplicate_ids' in active_fixes and header_id in seen_ids:
+            # Resume from the last suffix handed out for this ID, so k copies of one ID cost O(k), not O(k^2)
+            count = next_suffix.get(header_id, 2)
+            while f"{header_id}_{count}" in seen_ids:
+                count += 1
+            next_suffix[header_id] = count + 1
+            header_id = f"{header_id}_{count}"
+        seen_ids.add(header_id)
+
+        # Sequence-line specific fixes
+        fixed_seq_lines = []
+        for seq_data in seq_lines:
+            if check_stops:
+                without_terminal_stops = seq_data.rstrip('*')
+                if internal_stop_fix and '*' in without_terminal_stops:
+                    continue # Discard sequence
+                if terminal_stop_fix:
+                    seq_data = without_terminal_stops
+            if seq_table is not None:
+                if seq_data.isascii():
+                    # Uppercasing and non-standard replacement in one C-level pass
+                    seq_data = seq_data.translate(seq_table)
+                else:
+                    if uppercase_fix:
+                        seq_data = seq_data.upper()
+                    # MODIFICATION: Fix for non-standard AAs
+                    if non_standard_fix:
+                        seq_data = ''.join([char if char.upper() in STANDARD_AMINO_ACIDS or char == '*' else 'X' for char in seq_data])
+            if seq_data: # Don't write empty sequence lines
+                fixed_seq_lines.append(seq_data)
+
+        # Drop short sequences as each record completes instead of re-scanning the output
+        if 'short_sequence' in active_fixes and len("".join(fixed_seq_lines)) < 20:
+            continue
+
+        # Final cleanup for empty lines if the fix is active
+        if 'empty_lines' in active_fixes:
+            fixed_seq_lines = [line for line in fixed_seq_lines if line.strip()]
+
+        yield f">{header_id} {''.join(desc)}"
+        yield from fixed_seq_lines
+
+def fix_fasta_file(original_path, target_path, active_fixes):
+    """
+    Writes the fixed version of original_path to target_path, streaming the records through
+    a temp file that only replaces the target if anything survived the fixes.
+    Uses no request state, so it can run on any thread. Returns the number of records
+    written, so callers don't have to re-read the file to count them.
+    """
+    target_path = Path(target_path)
+    fd, tmp_path = tempfile.mkstemp(dir=target_path.parent, prefix=f".{target_path.name}.", suffix='.tmp')
+    try:
+        os.fchmod(fd, utils.DEFAULT_FILE_MODE)  # mkstemp's 0600 would survive os.replace
+        wrote_any = False
+        record_count = 0
+        with open(original_path, 'r', encoding='utf-8', errors='ignore') as f_in, \
+                os.fdopen(fd, 'w', encoding='utf-8', buffering=1 << 20) as f_out:
+            for line in iter_fixed_fasta_lines(f_in, active_fixes):
+                f_out.write('\n' + line if wrote_any else line)
+                wrote_any = True
+                if line.startswith('>'):
+                    record_count += 1
+
+        # If after all fixes, the file is empty, don't write it
+        if wrote_any:
+            os.replace(tmp_path, target_path)
+        else:
+            os.remove(tmp_path)
+        return record_count
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 @app.route('/api/fix_and_upload_files', methods=['POST'])
 def fix_and_upload_files():
     """
@@ -3194,7 +3692,10 @@ def fix_and_upload_files():
     if not current_proj:
         return jsonify({'success': False, 'message': 'No project selected'}), 400
 
-    temp_dir = VALIDATION_TEMP_DIR / session_id
+    # Lexical check against the base resolved at startup, so the only filesystem call left is one stat
+    if os.sep in session_id or not is_within_directory(VALIDATION_TEMP_DIR_ABS, session_id):
+        return jsonify({'success': False, 'message': 'Invalid validation session ID'}), 400
+    temp_dir = Path(VALIDATION_TEMP_DIR_ABS) / session_id
     if not temp_dir.is_dir():
         return jsonify({'success': False, 'message': 'Validation session expired or not found'}), 404
 
@@ -3202,110 +3703,18 @@ def fix_and_upload_files():
     project_input_dir.mkdir(parents=True, exist_ok=True)
 
     try:
+        fixed_record_counts = {}
         for filename, active_fixes in fixes_to_apply.items():
-            original_path = temp_dir / secure_filename(filename)
-            target_path = project_input_dir / secure_filename(filename)
+            safe_filename = secure_filename(filename)
+            original_path = temp_dir / safe_filename
+            target_path = project_input_dir / safe_filename
 
             if not original_path.exists():
                 continue
 
-            with open(original_path, 'r', encoding='utf-8', errors='ignore') as f_in:
-                content = f_in.read()
-
-            # Apply fixes sequentially
-            if 'windows_endings' in active_fixes:
-                content = content.replace('\r\n', '\n')
-
-            # NEW: Fix for empty lines
-            if 'empty_lines' in active_fixes:
-                content = "\n".join(line for line in content.split('\n') if line.strip() or line == '')
-            
-            # Unwrapper should run first
-            if 'multiline_wrapping' in active_fixes:
-                sequences = content.split('>')
-                unwrapped_content = []
-                for seq_block in sequences:
-                    if not seq_block.strip(): continue
-                    parts = seq_block.split('\n', 1)
-                    header = parts[0]
-                    seq_data = parts[1].replace('\n', '') if len(parts) > 1 else ''
-                    unwrapped_content.append(f">{header}\n{seq_data}")
-                content = "\n".join(unwrapped_content)
-
-            # Process line-by-line fixes
-            fixed_lines = []
-            seen_ids = set()
-            for line in content.split('\n'):
-                if line.startswith('>'):
-                    header_id, *desc = line[1:].split(' ', 1)
-                    original_id = header_id
-                    if 'illegal_chars_header' in active_fixes:
-                        # MODIFICATION: Apply the new, more specific replacement rules.
-                        header_id = header_id.replace('{', '(').replace('}', ')')
-                        header_id = header_id.replace('[', '(').replace(']', ')')
-                        header_id = header_id.replace('/', '_').replace('\\', '_')
-                        header_id = re.sub(r'[!@#$%^*]', '_', header_id)
-                        header_id = header_id.replace("'", "").replace('"', "")
-                        header_id = header_id.replace(':', '-')
-                        header_id = header_id.replace(';', '-')
-                        # Clean up multiple spaces that might result from replacements
-                        header_id = re.sub(r'\s+', ' ', header_id).strip()
-
-                    if 'duplicate_ids' in active_fixes:
-                        new_id = header_id
-                        count = 1
-                        while new_id in seen_ids:
-                            count += 1
-                            new_id = f"{header_id}_{count}"
-                        header_id = new_id
-                    seen_ids.add(header_id)
-                    fixed_lines.append(f">{header_id} {''.join(desc)}")
-                else:
-                    # This part is now handled by the block processing logic
-                    # but we keep it for the sequence-line specific fixes
-                    seq_data = line
-                    if 'internal_stop_codon' in active_fixes and '*' in seq_data.rstrip('*'):
-                        continue # Discard sequence
-                    if 'terminal_stop_codon' in active_fixes:
-                        seq_data = seq_data.rstrip('*')
-                    if 'lowercase_sequences' in active_fixes:
-                        seq_data = seq_data.upper()
-                    # MODIFICATION: Fix for non-standard AAs
-                    if 'non_standard_aas' in active_fixes:
-                        seq_data = ''.join([char if char.upper() in STANDARD_AMINO_ACIDS or char == '*' else 'X' for char in seq_data])
-                    if seq_data: # Don't write empty sequence lines
-                        fixed_lines.append(seq_data)
-            
-            # NEW: Re-process with block logic to handle short sequences
-            final_fixed_lines = []
-            current_block = []
-            for line in fixed_lines:
-                if line.startswith('>'):
-                    if current_block: # Process previous block
-                        seq_data = "".join(current_block[1:])
-                        if 'short_sequence' not in active_fixes or len(seq_data) >= 20:
-                            final_fixed_lines.extend(current_block)
-                    current_block = [line] # Start new block
-                else:
-                    if current_block: # Only add sequence if a header was found
-                        current_block.append(line)
-            
-            # Process the last block
-            if current_block:
-                seq_data = "".join(current_block[1:])
-                if 'short_sequence' not in active_fixes or len(seq_data) >= 20:
-                    final_fixed_lines.extend(current_block)
-
-            # Final cleanup for empty lines if the fix is active
-            if 'empty_lines' in active_fixes:
-                final_fixed_lines = [line for line in final_fixed_lines if line.strip()]
-
-            # If after all fixes, the file is empty, don't write it
-            if not final_fixed_lines:
-                continue
-
-            with open(target_path, 'w', encoding='utf-8') as f_out:
-                f_out.write('\n'.join(final_fixed_lines))
+            # The fixing is pure CPU work; run it on a native thread so the eventlet hub keeps
+            # serving other requests and Socket.IO pings meanwhile
+            fixed_record_counts[filename] = tpool.execute(fix_fasta_file, original_path, target_path, active_fixes)
 
         # Now, call the original upload logic to combine the (now fixed) files
         # We can reuse the logic from `upload_files` by calling it internally or duplicating it.
@@ -3313,18 +3722,28 @@ def fix_and_upload_files():
         input_combined_path = project_input_dir / 'combined.faa'
         output_combined_path = OUTPUT_DIR / current_proj / 'combined.faa'
         total_sequences = 0
-        with open(input_combined_path, 'w') as input_outfile, open(output_combined_path, 'w') as output_outfile:
+        with open(input_combined_path, 'wb', buffering=COMBINED_FILE_BUFFER_SIZE) as input_outfile:
             for filename in fixes_to_apply.keys():
                 filepath = project_input_dir / secure_filename(filename)
                 if not filepath.exists(): continue
-                with open(filepath, 'r') as infile:
-                    content = infile.read()
-                    total_sequences += content.count('>')
-                    input_outfile.write(content + '\n')
-                    output_outfile.write(content + '\n')
+                record_count = fixed_record_counts.get(filename)
+                if record_count:
+                    # Just written by fix_fasta_file with '\n' endings and a known record count: plain copy
+                    with open(filepath, 'rb') as infile:
+                        shutil.copyfileobj(infile, input_outfile, COMBINED_FILE_BUFFER_SIZE)
+                    total_sequences += record_count
+                else:
+                    total_sequences += append_fasta_file(filepath, (input_outfile,))
+                input_outfile.write(b'\n')
 
-        # Clean up the temporary validation directory
-        shutil.rmtree(temp_dir)
+        # The output copy is identical; shutil.copyfile lets the kernel copy it (sendfile) on Linux
+        shutil.copyfile(input_combined_path, output_combined_path)
+
+        # Clean up the temporary validation directory: one rename takes it out of the way,
+        # the unlinking happens on a native thread after the response has been sent
+        trash_dir = temp_dir.with_name(f".deleting.{temp_dir.name}.{secrets.token_hex(8)}")
+        temp_dir.rename(trash_dir)
+        threading.Thread(target=tpool.execute, args=(shutil.rmtree, trash_dir, True), daemon=True).start()
 
         return jsonify({
             'success': True,
@@ -3351,8 +3770,7 @@ def get_pdb_search_cache(protein_name):
 
     if cached_json_filepath.is_file():
         try:
-            with open(cached_json_filepath, 'r') as f:
-                cached_matches = json.load(f)
+            cached_matches = load_json_file(cached_json_filepath)
             return jsonify({'success': True, 'matches': cached_matches, 'cached': True})
         except Exception as e:
             # If reading the cache fails, report it.
@@ -3383,13 +3801,12 @@ def save_project_config():
     try:
         all_configs = {}
         if config_filepath.is_file():
-            with open(config_filepath, 'r') as f:
-                all_configs = json.load(f)
+            all_configs = load_json_file(config_filepath)
         
         all_configs[database] = config
 
-        with open(config_filepath, 'w') as f:
-            json.dump(all_configs, f, indent=2)
+        with open(config_filepath, 'wb') as f:
+            f.write(dump_json_bytes(all_configs))
 
         return jsonify({'success': True, 'message': 'Configuration saved.'})
     except Exception as e:
@@ -3407,8 +3824,7 @@ def load_project_configs():
 
     if config_filepath.is_file():
         try:
-            with open(config_filepath, 'r') as f:
-                configs = json.load(f)
+            configs = load_json_file(config_filepath)
             return jsonify({'success': True, 'configs': configs})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
@@ -3416,29 +3832,69 @@ def load_project_configs():
         # It's not an error if the file doesn't exist yet
         return jsonify({'success': True, 'configs': {}})
 
+# Downloaded PDB files, shared by all projects. Entries younger than PDB_CACHE_MAX_AGE are served
+# as-is; older ones are revalidated against RCSB with the ETag stored next to them.
+PDB_FILE_CACHE_DIR = STRUCTURE_DIR / "_pdb_file_cache"
+PDB_CACHE_MAX_AGE = 7 * 24 * 3600
+PDB_ID_RE = re.compile(r'[A-Za-z0-9_]{4,12}')
+
 @app.route('/api/fetch_and_cache_pdb/<pdb_id>', methods=['POST'])
 def fetch_and_cache_pdb(pdb_id):
     """
-    Acts as a proxy to download a PDB file from RCSB.
-    Returns the raw PDB data content without saving it to a file.
+    Acts as a proxy to download a PDB file from RCSB, keeping a shared on-disk copy.
+    Returns the raw PDB data content.
     """
-    # Download from RCSB
+    import requests
+
+    if not PDB_ID_RE.fullmatch(pdb_id):
+        return jsonify({'success': False, 'message': f'Invalid PDB ID: {pdb_id}'}), 400
+
+    pdb_id = pdb_id.upper()
+    cached_pdb_path = PDB_FILE_CACHE_DIR / f"{pdb_id}.pdb"
+    etag_path = PDB_FILE_CACHE_DIR / f"{pdb_id}.etag"
+
+    try:
+        cached_age = time.time() - cached_pdb_path.stat().st_mtime
+    except FileNotFoundError:
+        cached_age = None
+
+    if cached_age is not None and cached_age < PDB_CACHE_MAX_AGE:
+        return jsonify({'success': True, 'pdb_data': cached_pdb_path.read_text()})
+
+    # Download from RCSB, revalidating a stale cached copy when we have its ETag
     pdb_url = f"https://files.rcsb.org/download/{pdb_id}.pdb"
+    headers = {}
+    if cached_age is not None and etag_path.is_file():
+        headers['If-None-Match'] = etag_path.read_text().strip()
+
     try:
-        import requests
-        response = requests.get(pdb_url, timeout=30)
+        response = get_http_client().get(pdb_url, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code == 304:
+            os.utime(cached_pdb_path)  # Still current; restart its freshness window
+            return jsonify({'success': True, 'pdb_data': cached_pdb_path.read_text()})
         response.raise_for_status() # Will raise an HTTPError for bad responses (4xx or 5xx)
         
         pdb_data = response.text
         if not pdb_data:
             return jsonify({'success': False, 'message': 'Downloaded PDB file was empty.'}), 500
 
+        try:
+            PDB_FILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _atomic_write_bytes(cached_pdb_path, response.content)
+            if etag := response.headers.get('ETag'):
+                _atomic_write_bytes(etag_path, etag.encode())
+        except OSError as e:
+            print(f"Warning: Could not cache PDB file {pdb_id}: {e}")
+
         return jsonify({
             'success': True, 
             'pdb_data': pdb_data
         })
 
     except requests.exceptions.RequestException as e:
+        if cached_age is not None:
+            # RCSB unreachable: a stale copy is better than no structure
+            return jsonify({'success': True, 'pdb_data': cached_pdb_path.read_text()})
         return jsonify({'success': False, 'message': f'Failed to download PDB file from RCSB: {str(e)}'}), 502
 
 # =============================================================================
@@ -9,13 +9,17 @@ Usage:
 python3 filter_database.py human --project Trial2
 python3 filter_database.py human --dry-run
 """
+import os
 import sys
+import math
 import argparse
 import time
-import multiprocessing
-import pickle
+import re
+import signal
+import json
 import hashlib
 import shutil
+import tempfile
 from pathlib import Path
 from datetime import datetime
 
@@ -23,6 +27,11 @@ from datetime import datetime
 import config as config
 import utils
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json module is used instead
+    orjson = None
+
 # =============================================================================
 # DATABASE CONFIGURATIONS
 # =============================================================================
@@ -65,12 +74,22 @@ DATABASE_CONFIGS = {
     },
 }
 
+# blastp threads per process when a BLAST run is split into parallel query chunks
+BLAST_THREADS_PER_CHUNK = 4
+
 # =============================================================================
 # LOGGING
 # =============================================================================
 
 class Logger:
-    """Dual output to console and file."""
+    """
+    Dual output to console and file.
+    The log file is block-buffered (one write syscall per 64 KB instead of per line);
+    it is flushed with every flush() call, i.e. on progress updates and step ends.
+    Output printed since the last flush only reaches the file when the logger is
+    flushed or closed, so it is lost if the process dies without closing it (SIGKILL);
+    main() turns SIGTERM into a normal exit so a stopped job still closes the log.
+    """
 
     def __init__(self, log_file=None):
         self.terminal = sys.stdout
@@ -79,7 +98,7 @@ class Logger:
         if log_file:
             # <-- MODIFIED: Ensure log directory exists (now handled by config)
             # log_file.parent.mkdir(parents=True, exist_ok=True)
-            self.log_file = open(log_file, 'w', buffering=1)
+            self.log_file = open(log_file, 'w', buffering=64 * 1024)
 
     def write(self, message):
         self.terminal.write(message)
@@ -103,7 +122,7 @@ def get_cache_key(blast_file, identity, coverage, evalue):
     """Generate unique cache key."""
     blast_mtime = blast_file.stat().st_mtime if blast_file.exists() else 0
     key_str = f"{blast_file}_{blast_mtime}_{identity}_{coverage}_{evalue}"
-    return hashlib.md5(key_str.encode()).hexdigest()
+    return hashlib.blake2b(key_str.encode(), digest_size=16).hexdigest()
 
 def get_cached_results(cache_file, blast_file, identity, coverage, evalue):
     """Load cached results if valid."""
@@ -111,11 +130,17 @@ def get_cached_results(cache_file, blast_file, identity, coverage, evalue):
         return None
 
     try:
+        expected_key = get_cache_key(blast_file, identity, coverage, evalue)
         with open(cache_file, 'rb') as f:
-            cached = pickle.load(f)
+            data = f.read()
+        cached = orjson.loads(data) if orjson is not None else json.loads(data)
 
-        expected_key = get_cache_key(blast_file, identity, coverage, evalue)
         if cached.get('cache_key') == expected_key:
+            # JSON has no sets; the IDs are stored as a list (only rebuilt for a valid cache)
+            cached['filtered_ids'] = set(cached['filtered_ids'])
+            if 'blast_hit_count' not in cached:
+                # Caches written before the raw hit table was dropped
+                cached['blast_hit_count'] = len(cached.get('blast_hits', ()))
             return cached
     except Exception:
         pass
@@ -123,22 +148,37 @@ def get_cached_results(cache_file, blast_file, identity, coverage, evalue):
     return None
 
 def save_cached_results(cache_file, blast_file, identity, coverage, evalue,
-                        filtered_ids, hit_details, blast_hits):
+                        filtered_ids, hit_details, blast_hit_count):
     """Save results to cache."""
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
     try:
         cache_data = {
             'cache_key': get_cache_key(blast_file, identity, coverage, evalue),
-            'filtered_ids': filtered_ids,
+            'filtered_ids': sorted(filtered_ids),
             'hit_details': hit_details,
-            'blast_hits': blast_hits,
+            # Only the number of raw hits is ever read back; the full hit table (by far the
+            # largest part) is not stored, since it can always be re-parsed from blast_file
+            'blast_hit_count': blast_hit_count,
             'timestamp': datetime.now().isoformat()
         }
 
-        with open(cache_file, 'wb') as f:
-            pickle.dump(cache_data, f)
+        # JSON instead of pickle: decodes several times faster and loading it cannot execute code
+        if orjson is not None:
+            data = orjson.dumps(cache_data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            data = json.dumps(cache_data).encode('utf-8')
+
+        # Write beside the target and swap it in, so a crash never leaves a truncated cache
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, cache_file)
 
         return True
     except Exception:
+        try:
+            tmp_file.unlink(missing_ok=True)
+        except OSError:
+            pass
         return False
 
 # =============================================================================
@@ -154,7 +194,50 @@ def check_blast_db(db_path):
     return False
 
 def get_blast_db_info(db_path):
-    """Get database information."""
+    """
+    Get database information. The result is kept in a '<db>.info.json' sidecar and
+    reused while the .phr/.pin/.psq files are unchanged, so blastdbcmd only runs
+    once per database build instead of on every filter and dry run.
+    """
+    signature = []
+    for ext in ['.phr', '.pin', '.psq']:
+        try:
+            st = Path(str(db_path) + ext).stat()
+        except OSError:
+            continue
+        signature.append([ext, st.st_mtime_ns, st.st_size])
+
+    sidecar = Path(str(db_path) + '.info.json')
+    try:
+        cached = json.loads(sidecar.read_bytes())
+        if cached['signature'] == signature and cached.get('version') == BLAST_DB_INFO_VERSION:
+            return cached['info']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    info = query_blast_db_info(db_path)
+
+    if signature and info['sequences'] is not None:
+        tmp_file = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+        try:
+            tmp_file.write_text(json.dumps({'signature': signature, 'version': BLAST_DB_INFO_VERSION, 'info': info}))
+            os.replace(tmp_file, sidecar)
+        except OSError:
+            # e.g. a read-only database directory or a full disk
+            try:
+                tmp_file.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    return info
+
+BLAST_DB_COUNTS_RE = re.compile(r'([\d,]+) sequences; ([\d,]+) total (?:letters|residues|bases)')
+
+# Bumped whenever query_blast_db_info's output changes, to invalidate older sidecars
+BLAST_DB_INFO_VERSION = 2
+
+def query_blast_db_info(db_path):
+    """Run blastdbcmd -info and collect database statistics."""
     import subprocess
 
     info = {
@@ -173,24 +256,12 @@ def get_blast_db_info(db_path):
         )
 
         if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                line_lower = line.lower()
-
-                if 'sequences' in line_lower:
-                    parts = line.split()
-                    for part in parts:
-                        clean = part.replace(',', '')
-                        if clean.isdigit():
-                            info['sequences'] = int(clean)
-                            break
-
-                elif 'bases' in line_lower or 'letters' in line_lower:
-                    parts = line.split()
-                    for part in parts:
-                        clean = part.replace(',', '')
-                        if clean.isdigit():
-                            info['residues'] = int(clean)
-                            break
+            # Both counts share one line, e.g. "\t20,434 sequences; 11,371,624 total letters"
+            # (the "Longest sequence: ... letters" line must not be mistaken for the total)
+            match = BLAST_DB_COUNTS_RE.search(result.stdout)
+            if match:
+                info['sequences'] = int(match.group(1).replace(',', ''))
+                info['residues'] = int(match.group(2).replace(',', ''))
 
             # Get file sizes
             for ext in ['.phr', '.pin', '.psq']:
@@ -205,34 +276,60 @@ def get_blast_db_info(db_path):
 
     return info
 
-def estimate_blast_time(num_queries, db_sequences, threads):
-    """Estimate BLAST runtime."""
-    if not db_sequences:
+# BLAST speed in query x database residue pairs per second per thread. Starts from a rough
+# default and is re-measured after every real BLAST run, per database (stored in
+# BLAST_CALIBRATION_FILE as {database name: rate}), since the speed differs between databases.
+BLAST_DEFAULT_CELLS_PER_SECOND = 2.5e9
+BLAST_CALIBRATION_FILE = config.OUTPUT_DIR / ".blast_calibration.json"
+
+def load_blast_calibration():
+    """Return the stored {database name: cells per second} rates (empty if none)."""
+    try:
+        rates = json.loads(BLAST_CALIBRATION_FILE.read_bytes())['cells_per_second']
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+    return rates if isinstance(rates, dict) else {}  # older files held one global rate
+
+def estimate_blast_time(query_residues, db_residues, threads, db_name):
+    """
+    Estimate BLAST runtime. The search cost grows with query length x database
+    length, so this uses total residues rather than sequence counts.
+    """
+    if not db_residues or not query_residues:
         return None
 
-    base_rate = 50
+    rate = load_blast_calibration().get(db_name, BLAST_DEFAULT_CELLS_PER_SECOND)
 
-    if db_sequences > 100000:
-        base_rate *= 0.5
-    elif db_sequences > 1000000:
-        base_rate *= 0.3
+    return query_residues * db_residues / (rate * max(1, threads))
 
-    effective_rate = base_rate * threads
-    minutes = num_queries / effective_rate
+def record_blast_calibration(query_residues, db_residues, threads, elapsed, db_name):
+    """Store the speed measured by a finished BLAST run against db_name for later estimates."""
+    # Very short runs are dominated by startup and DB loading; they would skew the rate
+    if not db_residues or not query_residues or elapsed < 30:
+        return
 
-    return minutes * 60
+    rates = load_blast_calibration()
+    rates[db_name] = query_residues * db_residues / (max(1, threads) * elapsed)
+    tmp_file = BLAST_CALIBRATION_FILE.with_name(f"{BLAST_CALIBRATION_FILE.name}.{os.getpid()}.tmp")
+    try:
+        tmp_file.write_text(json.dumps({'cells_per_second': rates, 'measured': datetime.now().isoformat()}))
+        os.replace(tmp_file, BLAST_CALIBRATION_FILE)
+    except OSError:
+        try:
+            tmp_file.unlink(missing_ok=True)
+        except OSError:
+            pass
 
 # =============================================================================
 # UTILITIES
 # =============================================================================
 
+BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
 def format_bytes(bytes_size):
-    """Format bytes to human-readable."""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes_size < 1024.0:
-            return f"{bytes_size:.1f} {unit}"
-        bytes_size /= 1024.0
-    return f"{bytes_size:.1f} PB"
+    """Format bytes to human-readable (the unit comes straight from the bit length)."""
+    exponent = min(5, max(0, (int(bytes_size).bit_length() - 1) // 10))
+    return f"{bytes_size / (1 << (exponent * 10)):.1f} {BYTE_UNITS[exponent]}"
 
 def format_time(seconds):
     """Format seconds to human-readable."""
@@ -243,14 +340,38 @@ def format_time(seconds):
     else:
         return f"{seconds / 3600:.1f} hours"
 
+def print_banner(title):
+    """Print a '=' framed section title as one write."""
+    print(f"\n{'=' * 70}\n{title}\n{'=' * 70}")
+
 def print_step_time(start_time):
     """Print step completion time."""
     elapsed = time.time() - start_time
-    print(f"  ⏱ Completed in {format_time(elapsed)}")
+    print(f"  ⏱ Completed in {format_time(elapsed)}", flush=True)
+
+def available_cpu_count():
+    """
+    CPUs this process may actually use: the scheduler affinity mask, capped by a
+    cgroup v2 CPU quota (containers, SLURM) when one is set.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):  # not available outside Linux
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return cpus
 
 def determine_thread_count(threads_arg):
     """Determine number of threads."""
-    total_cpus = multiprocessing.cpu_count()
+    total_cpus = available_cpu_count()
     default_threads = max(1, total_cpus - 4)
 
     warning = None
@@ -274,6 +395,123 @@ def determine_thread_count(threads_arg):
 
     return threads, mode, warning, total_cpus
 
+def build_blastp_command(query_fasta, blast_db, output_file, evalue, num_threads):
+    """Build the blastp command line (tabular output)."""
+    return [
+        'blastp',
+        '-db', str(blast_db),
+        '-query', str(query_fasta),
+        '-out', str(output_file),
+        '-outfmt', '6',
+        '-evalue', str(evalue),
+        '-num_threads', str(num_threads)
+    ]
+
+def split_fasta_into_chunks(query_fasta, chunk_dir, chunk_count):
+    """Write the records of query_fasta into up to chunk_count contiguous chunk files."""
+    total = utils.count_fasta_records(query_fasta)
+    per_chunk = max(1, -(-total // chunk_count))
+
+    chunk_paths = []
+    out = None
+    in_chunk = 0
+    try:
+        for _, record in utils.iter_fasta_records(query_fasta):
+            if out is None or in_chunk == per_chunk:
+                if out is not None:
+                    out.close()
+                chunk_path = chunk_dir / f"chunk_{len(chunk_paths):03d}.faa"
+                out = open(chunk_path, 'wb', buffering=1024 * 1024)
+                chunk_paths.append(chunk_path)
+                in_chunk = 0
+            out.write(record if record.endswith(b'\n') else record + b'\n')
+            in_chunk += 1
+    finally:
+        if out is not None:
+            out.close()
+
+    return chunk_paths
+
+def run_blastp_chunked(query_fasta, blast_db, output_file, evalue, num_threads, chunk_count, blast_start):
+    """
+    Run BLAST as several blastp processes over contiguous query chunks.
+    blastp's threading scales sublinearly (only part of the search is threaded), so a few
+    processes with a handful of threads each keep more cores busy than one big process.
+    Queries are independent and the DB size alone sets the search space, so concatenating
+    the chunk outputs in order gives the same hits, in the same order, as a single run.
+    """
+    import subprocess
+
+    chunk_dir = output_file.parent / f".{output_file.name}.chunks"
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    chunk_dir.mkdir(parents=True)
+
+    jobs = []
+    last_size = 0
+    try:
+        chunk_paths = split_fasta_into_chunks(query_fasta, chunk_dir, chunk_count)
+        threads_per_chunk = max(1, num_threads // max(1, len(chunk_paths)))
+        print(f"    Chunks: {len(chunk_paths)} x {threads_per_chunk} threads", flush=True)
+
+        for chunk_path in chunk_paths:
+            chunk_output = chunk_path.with_suffix('.tsv')
+            stderr_path = chunk_path.with_suffix('.err')
+            # stderr goes to a file: an unread pipe can fill up and stall blastp
+            with open(stderr_path, 'wb') as stderr_file:
+                process = subprocess.Popen(
+                    build_blastp_command(chunk_path, blast_db, chunk_output, evalue, threads_per_chunk),
+                    stdout=subprocess.DEVNULL, stderr=stderr_file
+                )
+            jobs.append((process, chunk_output, stderr_path))
+
+        # Finished chunks are appended to output_file in query order as soon as all earlier
+        # chunks are in, so the file grows during the run (the web app tracks its size)
+        next_chunk = 0
+        completed = False
+        with open(output_file, 'wb') as out:
+            try:
+                running = [process for process, _, _ in jobs]
+                while running:
+                    try:
+                        running[0].wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        pass
+                    running = [process for process in running if process.poll() is None]
+
+                    for process, _, stderr_path in jobs:
+                        if process.returncode not in (None, 0):
+                            raise RuntimeError(f"BLAST failed:\n{stderr_path.read_text(errors='replace')}")
+
+                    while next_chunk < len(jobs) and jobs[next_chunk][0].returncode == 0:
+                        chunk_output = jobs[next_chunk][1]
+                        if chunk_output.exists():
+                            with open(chunk_output, 'rb') as chunk_in:
+                                shutil.copyfileobj(chunk_in, out, 1024 * 1024)
+                            out.flush()
+                        next_chunk += 1
+
+                    current_size = out.tell()
+                    if current_size > last_size:
+                        elapsed = time.time() - blast_start
+                        print(f"\r  Progress: {format_time(elapsed)} | "
+                              f"Output: {format_bytes(current_size)} | "
+                              f"Chunks: {next_chunk}/{len(jobs)}" + " " * 10,
+                              end='', flush=True)
+                        last_size = current_size
+                completed = True
+            finally:
+                if not completed:
+                    # A partial file would be taken for a finished run ("Using existing") next time
+                    out.close()
+                    output_file.unlink(missing_ok=True)
+        print()
+    finally:
+        for process, _, _ in jobs:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
 def run_blastp_with_progress(query_fasta, blast_db, output_file, evalue, num_threads, num_queries):
     """Run BLAST with progress."""
     import subprocess
@@ -285,38 +523,60 @@ def run_blastp_with_progress(query_fasta, blast_db, output_file, evalue, num_thr
 
     blast_start = time.time()
 
-    cmd = [
-        'blastp',
-        '-db', str(blast_db),
-        '-query', str(query_fasta),
-        '-out', str(output_file),
-        '-outfmt', '6',
-        '-evalue', str(evalue),
-        '-num_threads', str(num_threads)
-    ]
+    chunk_count = min(num_threads // BLAST_THREADS_PER_CHUNK, num_queries)
+    if chunk_count > 1:
+        run_blastp_chunked(query_fasta, blast_db, output_file, evalue, num_threads, chunk_count, blast_start)
+        return report_blast_completion(output_file, blast_start)
 
-    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    cmd = build_blastp_command(query_fasta, blast_db, output_file, evalue, num_threads)
+    sys.stdout.flush()
 
-    last_size = 0
-    while process.poll() is None:
-        time.sleep(5)
+    # blastp writes its results to -out, so stdout is discarded. stderr is kept as raw bytes in an
+    # anonymous temp file (an unread pipe could fill up and stall blastp) and only decoded on failure.
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr_file)
 
-        if output_file.exists():
-            current_size = output_file.stat().st_size
+    last_size = 0
+    # Once BLAST has created its output, keep it open and fstat() it: no path lookup per probe
+    output_fd = None
+    try:
+        while True:
+            # Wakes as soon as BLAST exits instead of finishing out a fixed sleep
+            try:
+                process.wait(timeout=5)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            if output_fd is None:
+                try:
+                    output_fd = os.open(output_file, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+            current_size = os.fstat(output_fd).st_size
             if current_size > last_size:
                 elapsed = time.time() - blast_start
                 print(f"\r  Progress: {format_time(elapsed)} | "
                       f"Output: {format_bytes(current_size)}" + " " * 10,
                       end='', flush=True)
                 last_size = current_size
+    finally:
+        if output_fd is not None:
+            os.close(output_fd)
 
     returncode = process.wait()
     print()
 
-    if returncode != 0:
-        stderr = process.stderr.read()
-        raise RuntimeError(f"BLAST failed:\n{stderr}")
+    with stderr_file:
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode('utf-8', errors='replace')
+            raise RuntimeError(f"BLAST failed:\n{stderr}")
 
+    return report_blast_completion(output_file, blast_start)
+
+def report_blast_completion(output_file, blast_start):
+    """Print the BLAST result summary and return the elapsed time."""
     blast_elapsed = time.time() - blast_start
 
     if output_file.exists():
@@ -337,9 +597,7 @@ def run_blastp_with_progress(query_fasta, blast_db, output_file, evalue, num_thr
 def dry_run(db_name, db_config, identity, coverage, evalue, threads, skip_blast, project_name=None):
     """Preview without executing."""
 
-    print("\n" + "=" * 70)
-    print("🔍 DRY RUN - No files will be modified")
-    print("=" * 70)
+    print_banner("🔍 DRY RUN - No files will be modified")
 
     print(f"\n📋 Configuration:")
     print(f"  Database: {db_config['name']}")
@@ -367,13 +625,14 @@ def dry_run(db_name, db_config, identity, coverage, evalue, threads, skip_blast,
         # <-- MODIFIED: Use new function and pass project_name
         combined_file = config.get_combined_sequences_file(project_name)
         if combined_file.exists():
-            seq_count = sum(1 for line in open(combined_file) if line.startswith('>'))
+            seq_count = utils.cached_fasta_record_count(combined_file)
             print(f"  ✓ Combined sequences: {seq_count:,} (from {combined_file.name})")
+            query_fasta = combined_file
         else:
             # <-- MODIFIED: Check project input dir
             faa_files = list(project_input_dir.glob("*.faa"))
             if faa_files:
-                total = sum(sum(1 for line in open(f) if line.startswith('>')) for f in faa_files)
+                total = sum(utils.cached_fasta_record_count(f) for f in faa_files)
                 print(f"  ✓ Found {len(faa_files)} files in {project_input_dir.name}, ~{total:,} sequences")
             else:
                 print(f"  ✗ No input files found in {project_input_dir}")
@@ -384,8 +643,9 @@ def dry_run(db_name, db_config, identity, coverage, evalue, threads, skip_blast,
         prev_passing = config.get_passing_file(prev_db, project_name)
 
         if prev_passing.exists():
-            seq_count = sum(1 for line in open(prev_passing) if line.startswith('>'))
+            seq_count = utils.cached_fasta_record_count(prev_passing)
             print(f"  ✓ From {prev_db}: {seq_count:,} sequences")
+            query_fasta = prev_passing
         else:
             print(f"  ✗ Previous step not complete ({prev_passing.name} not found)")
             return
@@ -406,11 +666,17 @@ def dry_run(db_name, db_config, identity, coverage, evalue, threads, skip_blast,
 
     # Estimate
     print(f"\n⚙️ Resources:")
-    print(f"  CPUs: {multiprocessing.cpu_count()}")
+    print(f"  CPUs: {available_cpu_count()}")
     print(f"  Threads: {threads}")
 
-    if not skip_blast and 'seq_count' in locals() and db_info.get('sequences'):
-        est_time = estimate_blast_time(seq_count, db_info['sequences'], threads)
+    if not skip_blast and 'seq_count' in locals() and db_info.get('residues'):
+        if db_name == 'human':
+            # Only sequences that pass the length filter are BLASTed
+            query_residues = utils.cached_fasta_residue_total(
+                query_fasta, config.MIN_PROTEIN_LENGTH, config.MAX_PROTEIN_LENGTH)
+        else:
+            query_residues = utils.cached_fasta_residue_total(query_fasta)
+        est_time = estimate_blast_time(query_residues, db_info['residues'], threads, db_name)
         if est_time:
             print(f"  Estimated: {format_time(est_time)}")
 
@@ -457,13 +723,12 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
         dry_run(db_name, db_config, identity, coverage, evalue, threads, skip_blast, project_name)
         return
 
+    # Create the project dirs once; the config path getters used below don't touch the disk
+    project_output_dir, project_input_dir = config.ensure_project_dirs(project_name)
+
     # Logging
     logger = None
     if log_file or log_file is None:
-        # <-- MODIFIED: Get project output dir
-        project_output_dir = config.get_project_output_dir(project_name)
-        # project_output_dir.mkdir(parents=True, exist_ok=True) # <-- Handled by config func
-
         if log_file is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             # <-- MODIFIED: Pass project_name
@@ -480,9 +745,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
         start_datetime = datetime.now()
 
         # Header
-        print("\n" + "=" * 70)
-        print(f"RUNNING: {db_config['name']} Filter")
-        print("=" * 70)
+        print_banner(f"RUNNING: {db_config['name']} Filter")
 
         print(f"Start: {start_datetime.strftime('%Y-%m-%d %H:%M:%S')}")
         if logger:
@@ -512,15 +775,9 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
             print(f"  Caching: ENABLED")
 
         # Setup
-        print("\n" + "=" * 70)
-        print("STEP 1: Setup")
-        print("=" * 70)
+        print_banner("STEP 1: Setup")
         step1_start = time.time()
 
-        # <-- MODIFIED: Get project output dir (already created by log setup)
-        project_output_dir = config.get_project_output_dir(project_name)
-        project_input_dir = config.get_project_input_dir(project_name)
-
         if not skip_blast:
             print(f"\n  → Checking database...")
             if not check_blast_db(db_config['db_path']):
@@ -540,9 +797,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
         print_step_time(step1_start)
 
         # Input
-        print("\n" + "=" * 70)
-        print("STEP 2: Input")
-        print("=" * 70)
+        print_banner("STEP 2: Input")
         step2_start = time.time()
 
         # <-- MODIFIED: Pass project_name
@@ -571,12 +826,12 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                 print(f"  ✓ Combined: {total_seqs:,} sequences")
                 seq_count = total_seqs
             else:
-                seq_count = sum(1 for line in open(combined_file) if line.startswith('>'))
+                seq_count = utils.cached_fasta_record_count(combined_file)
                 print(f"\n  ✓ Combined file exists: {seq_count:,} sequences")
 
             # Copy to human_input.faa
             print(f"\n  → Copying to {input_file.name}...")
-            shutil.copy(combined_file, input_file)
+            shutil.copyfile(combined_file, input_file)
             print(f"  ✓ Input ready: {input_file.name}")
 
         else:
@@ -591,9 +846,10 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                 sys.exit(1)
 
             print(f"\n  → Loading from {prev_db} step...")
-            shutil.copy(prev_passing, input_file)
+            shutil.copyfile(prev_passing, input_file)
 
-            seq_count = sum(1 for line in open(input_file) if line.startswith('>'))
+            # Same content as prev_passing, whose count the previous step already recorded
+            seq_count = utils.cached_fasta_record_count(prev_passing)
             print(f"  ✓ Input: {input_file.name}")
             print(f"  ✓ Sequences: {seq_count:,}")
 
@@ -602,9 +858,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
         print_step_time(step2_start)
 
         # Analysis
-        print("\n" + "=" * 70)
-        print("STEP 3: Analysis")
-        print("=" * 70)
+        print_banner("STEP 3: Analysis")
         step3_start = time.time()
 
         print(f"\n  → Calculating lengths...")
@@ -633,9 +887,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
         print_step_time(step3_start)
 
         # BLAST
-        print("\n" + "=" * 70)
-        print("STEP 4: BLAST")
-        print("=" * 70)
+        print_banner("STEP 4: BLAST")
         step4_start = time.time()
 
         # <-- MODIFIED: Pass project_name
@@ -649,40 +901,55 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                 sys.exit(1)
 
             size = blast_output.stat().st_size
-            lines = sum(1 for _ in open(blast_output))
+            lines = utils.count_lines(blast_output)
 
             print(f"  ✓ Using existing: {blast_output.name}")
             print(f"    Size: {format_bytes(size)} | Hits: {lines:,}")
         else:
             print(f"\n  → Running BLAST ({threads} threads)...")
 
-            if 'db_info' in locals() and db_info.get('sequences'):
-                est_time = estimate_blast_time(len(filtered_seqs), db_info['sequences'], threads)
+            query_residues = sum(filtered_seqs.values())
+            db_residues = db_info.get('residues') if 'db_info' in locals() else None
+            if db_residues:
+                est_time = estimate_blast_time(query_residues, db_residues, threads, db_name)
                 if est_time:
                     print(f"  ⏱ Estimated: {format_time(est_time)}")
 
-            run_blastp_with_progress(
-                query_fasta=input_file,
-                blast_db=db_config['db_path'],
-                output_file=blast_output,
-                evalue=evalue,
-                num_threads=threads,
-                num_queries=len(filtered_seqs)
-            )
+            # Sequences outside the length range can never pass, so don't BLAST them
+            query_file = input_file
+            if len(filtered_seqs) < len(seq_lengths):
+                query_file = input_file.with_name(f".{db_name}_query.faa")
+                utils.extract_sequences_by_id(
+                    input_fasta=input_file,
+                    seq_ids=filtered_seqs.keys(),
+                    output_fasta=query_file
+                )
+
+            try:
+                blast_elapsed = run_blastp_with_progress(
+                    query_fasta=query_file,
+                    blast_db=db_config['db_path'],
+                    output_file=blast_output,
+                    evalue=evalue,
+                    num_threads=threads,
+                    num_queries=len(filtered_seqs)
+                )
+                record_blast_calibration(query_residues, db_residues, threads, blast_elapsed, db_name)
+            finally:
+                if query_file != input_file:
+                    query_file.unlink(missing_ok=True)
 
         print_step_time(step4_start)
 
         # Filtering
-        print("\n" + "=" * 70)
-        print("STEP 5: Filtering")
-        print("=" * 70)
+        print_banner("STEP 5: Filtering")
         step5_start = time.time()
 
         # <-- MODIFIED: Pass project_name
         cache_file = config.get_cache_file(db_name, project_name)
         filtered_ids = None
         hit_details = None
-        blast_hits = None
+        blast_hit_count = 0
 
         if use_cache:
             print("\n  → Checking cache...")
@@ -693,13 +960,14 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                 print(f"     Cached: {cached['timestamp']}")
                 filtered_ids = cached['filtered_ids']
                 hit_details = cached['hit_details']
-                blast_hits = cached['blast_hits']
-                print(f"     Raw: {len(blast_hits):,} | Passing: {len(filtered_ids):,}")
+                blast_hit_count = cached['blast_hit_count']
+                print(f"     Raw: {blast_hit_count:,} | Passing: {len(filtered_ids):,}")
 
         if filtered_ids is None:
             print(f"\n  → Parsing BLAST...")
             blast_hits = utils.parse_blast_results(blast_output)
-            print(f"  ✓ Raw hits: {len(blast_hits):,}")
+            blast_hit_count = len(blast_hits)
+            print(f"  ✓ Raw hits: {blast_hit_count:,}")
 
             if blast_hits:
                 print(f"\n  → Applying thresholds...")
@@ -715,20 +983,20 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                     evalue=evalue
                 )
 
-                print(f"\n  ✓ Passing: {len(filtered_ids):,} ({(len(filtered_ids)/len(blast_hits)*100):.2f}%)")
+                print(f"\n  ✓ Passing: {len(filtered_ids):,} ({(len(filtered_ids)/blast_hit_count*100):.2f}%)")
                 
                 if use_cache:
                     print(f"\n  → Saving cache...")
                     if save_cached_results(cache_file, blast_output, identity, coverage,
-                                        evalue, filtered_ids, hit_details, blast_hits):
+                                        evalue, filtered_ids, hit_details, blast_hit_count):
                         print(f"  ✓ Cached: {format_bytes(cache_file.stat().st_size)}")
             else:
                 filtered_ids = set()
                 hit_details = {}
 
+        # <-- MODIFIED: Pass project_name
+        filtered_file = config.get_filtered_file(db_name, project_name)
         if hit_details:
-            # <-- MODIFIED: Pass project_name
-            filtered_file = config.get_filtered_file(db_name, project_name)
             utils.save_filtered_results(
                 hit_details=hit_details,
                 output_file=filtered_file,
@@ -738,9 +1006,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
         print_step_time(step5_start)
 
         # Apply action
-        print("\n" + "=" * 70)
-        print(f"STEP 6: {db_config['action'].upper()}")
-        print("=" * 70)
+        print_banner(f"STEP 6: {db_config['action'].upper()}")
         step6_start = time.time()
 
         # <-- MODIFIED: Pass project_name
@@ -751,7 +1017,8 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
             if selection_type == 'negative':
                 # Negative selection: Remove matches (e.g., human-like proteins)
                 print(f"\n  → Rejecting matches (remove {db_name}-like proteins)...")
-                passing_ids = set(filtered_seqs.keys()) - filtered_ids
+                # keys() views support set difference directly; no intermediate set of all IDs
+                passing_ids = filtered_seqs.keys() - filtered_ids
 
                 print(f"     Input: {len(filtered_seqs):,}")
                 print(f"     Matches (rejected): {len(filtered_ids):,}")
@@ -762,6 +1029,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                     seq_ids=passing_ids,
                     output_fasta=passing_file
                 )
+                utils.save_fasta_record_count(passing_file, extracted)
 
                 print(f"\n  📊 Final:")
                 print(f"     ✓ Passed: {extracted:,}")
@@ -782,6 +1050,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
                         seq_ids=passing_ids,
                         output_fasta=passing_file
                     )
+                    utils.save_fasta_record_count(passing_file, extracted)
 
                     print(f"\n  📊 Final:")
                     print(f"     ✓ Kept: {extracted:,}")
@@ -820,7 +1089,7 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
             " ": "",
             "Input": len(seq_lengths),
             "After length filter": len(filtered_seqs),
-            "BLAST hits": len(blast_hits) if blast_hits else 0,
+            "BLAST hits": blast_hit_count,
             "Passing thresholds": len(filtered_ids) if filtered_ids else 0,
             "Final output": final_count,
             "  ": "",
@@ -840,26 +1109,27 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
             stats=stats
         )
 
-        print(f"\n{'=' * 70}")
-        print(f"✓✓✓ {db_config['name']} Filter COMPLETE ✓✓✓")
-        print(f"{'=' * 70}")
-
-        print(f"\n{'=' * 70}")
-        print("SUMMARY OF THIS STEP")
-        print(f"Total runtime: {format_time(overall_elapsed)}")
-
-        # <-- MODIFIED: Use project output dir
-        print(f"\nFiles in {project_output_dir}:")
-        print(f"  → {input_file.name}")
-        print(f"  → {blast_output.name}")
+        # The closing report is assembled first and printed as one block
+        summary_lines = [
+            f"\n{'=' * 70}",
+            f"✓✓✓ {db_config['name']} Filter COMPLETE ✓✓✓",
+            f"{'=' * 70}",
+            f"\n{'=' * 70}",
+            "SUMMARY OF THIS STEP",
+            f"Total runtime: {format_time(overall_elapsed)}",
+            # <-- MODIFIED: Use project output dir
+            f"\nFiles in {project_output_dir}:",
+            f"  → {input_file.name}",
+            f"  → {blast_output.name}",
+        ]
         if hit_details:
-            # <-- MODIFIED: Pass project_name
-            print(f"  → {config.get_filtered_file(db_name, project_name).name}")
-        print(f"  → {passing_file.name}")
-        print(f"  → {summary_file.name}")
+            summary_lines.append(f"  → {filtered_file.name}")
+        summary_lines.append(f"  → {passing_file.name}")
+        summary_lines.append(f"  → {summary_file.name}")
         if logger:
-            print(f"  → {log_file.name}")
-        print()
+            summary_lines.append(f"  → {log_file.name}")
+        summary_lines.append("")
+        print("\n".join(summary_lines), flush=True)
 
     finally:
         if logger:
@@ -870,7 +1140,15 @@ def filter_database(db_name, identity, coverage, evalue, skip_blast, threads_arg
 # CLI
 # =============================================================================
 
+def exit_on_sigterm(signum, frame):
+    """
+    SIGTERM handler: raises SystemExit so the finally blocks run on a job stop
+    (closing the Logger writes the buffered log tail to disk).
+    """
+    raise SystemExit(128 + signum)
+
 def main():
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
     parser = argparse.ArgumentParser(
         description='Filter sequences (v4.1) - Project-aware',
         formatter_class=argparse.RawDescriptionHelpFormatter,
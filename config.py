@@ -4,6 +4,8 @@ Configuration File for Protein Target Identification Pipeline (v2.2)
 =====================================================================
 Updated: Added project_name awareness to all file paths
 """
+from functools import lru_cache
+from types import MappingProxyType
 from pathlib import Path
 
 # =============================================================================
@@ -36,72 +38,104 @@ DRUGBANK_DB = DB_DIR / "drugbank" / "drugbank_database"
 # FILE NAMING FUNCTIONS
 # =============================================================================
 
+# The file-name getters below are pure and memoized: they never touch the disk.
+# Call ensure_project_dirs() once before writing any of those files.
+
+@lru_cache(maxsize=None)
+def project_output_path(project_name=None):
+    """Path of the project (or global) output dir, without creating it."""
+    return OUTPUT_DIR / project_name if project_name else OUTPUT_DIR
+
+@lru_cache(maxsize=None)
+def project_input_path(project_name=None):
+    """Path of the project (or global) input dir, without creating it."""
+    return INPUT_SEQUENCES / project_name if project_name else INPUT_SEQUENCES
+
+def ensure_project_dirs(project_name=None):
+    """Create the project's output and input dirs if needed; returns (output_dir, input_dir)."""
+    output_dir = project_output_path(project_name)
+    input_dir = project_input_path(project_name)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir, input_dir
+
+# Dirs already created by the helpers below, so repeat calls skip the mkdir syscall
+_CREATED_DIRS = set()
+
+def _ensure_dir_once(path):
+    if path not in _CREATED_DIRS:
+        path.mkdir(parents=True, exist_ok=True)
+        _CREATED_DIRS.add(path)
+    return path
+
 # <-- MODIFIED: Added a helper function to get the correct (project or global) output dir
 def get_project_output_dir(project_name=None):
-    """Helper to get the correct output dir and ensure it exists."""
-    project_dir = OUTPUT_DIR / project_name if project_name else OUTPUT_DIR
-    # Ensure the directory exists before returning
-    project_dir.mkdir(parents=True, exist_ok=True)
-    return project_dir
+    """Helper to get the correct output dir and ensure it exists (mkdir only on first use)."""
+    return _ensure_dir_once(project_output_path(project_name))
 
 # <-- MODIFIED: Added a helper function to get the correct (project or global) input dir
 def get_project_input_dir(project_name=None):
-    """Helper to get the correct input dir."""
-    project_dir = INPUT_SEQUENCES / project_name if project_name else INPUT_SEQUENCES
-    project_dir.mkdir(parents=True, exist_ok=True)
-    return project_dir
+    """Helper to get the correct input dir (created on first use)."""
+    return _ensure_dir_once(project_input_path(project_name))
 
 # <-- MODIFIED: Added project_name=None
+@lru_cache(maxsize=None)
 def get_input_file(database_name, project_name=None):
     """Get input file: {project}/{database}_input.faa"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     return project_dir / f"{database_name}_input.faa"
 
 # <-- MODIFIED: Added project_name=None
+@lru_cache(maxsize=None)
 def get_blast_file(database_name, project_name=None):
     """Get BLAST output: {project}/{database}_blast.txt"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     return project_dir / f"{database_name}_blast.txt"
 
 # <-- MODIFIED: Added project_name=None
+@lru_cache(maxsize=None)
 def get_filtered_file(database_name, project_name=None):
     """Get filtered results: {project}/{database}_filtered.tsv"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     return project_dir / f"{database_name}_filtered.tsv"
 
 # <-- MODIFIED: Added project_name=None
+@lru_cache(maxsize=None)
 def get_passing_file(database_name, project_name=None):
     """Get passing sequences: {project}/{database}_passing.faa"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     return project_dir / f"{database_name}_passing.faa"
 
 # <-- MODIFIED: Added project_name=None
+@lru_cache(maxsize=None)
 def get_summary_file(database_name, project_name=None):
     """Get summary report: {project}/{database}_summary.txt"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     return project_dir / f"{database_name}_summary.txt"
 
 # <-- MODIFIED: Added project_name=None
 def get_log_file(database_name, timestamp=None, project_name=None):
     """Get log file: {project}/{database}_run_{timestamp}.log"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     if timestamp:
         return project_dir / f"{database_name}_run_{timestamp}.log"
     return project_dir / f"{database_name}_run.log"
 
 # <-- MODIFIED: Added project_name=None
+@lru_cache(maxsize=None)
 def get_cache_file(database_name, project_name=None):
-    """Get cache file: {project}/.{database}_cache.pkl (hidden)"""
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
-    return project_dir / f".{database_name}_cache.pkl"
+    """Get cache file: {project}/.{database}_cache.json (hidden)"""
+    project_dir = project_output_path(project_name)
+    return project_dir / f".{database_name}_cache.json"
 
 # <-- MODIFIED: Changed from a global variable to a function
+@lru_cache(maxsize=None)
 def get_combined_sequences_file(project_name=None):
     """
     Get the combined input file for the project.
     The web app creates this in the project's *output* directory.
     """
-    project_dir = get_project_output_dir(project_name) # <-- MODIFIED
+    project_dir = project_output_path(project_name)
     return project_dir / "combined.faa"
 
 
@@ -109,8 +143,18 @@ def get_combined_sequences_file(project_name=None):
 # BLAST PARAMETERS
 # =============================================================================
 
-import multiprocessing
-BLAST_THREADS = max(1, multiprocessing.cpu_count() - 4)
+import os
+
+@lru_cache(maxsize=None)
+def get_blast_threads():
+    """Default BLAST thread count (all CPUs but 4), computed on first use rather than at import."""
+    return max(1, (os.cpu_count() or 5) - 4)
+
+def __getattr__(name):
+    # Keeps config.BLAST_THREADS working while deferring the CPU query until it is read
+    if name == 'BLAST_THREADS':
+        return get_blast_threads()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # =============================================================================
 # FILTERING THRESHOLDS
@@ -129,11 +173,28 @@ DEFAULT_THRESHOLDS = {
 MIN_PROTEIN_LENGTH = 50
 MAX_PROTEIN_LENGTH = 5000
 
+# =============================================================================
+# WEB SERVER FILE OFFLOADING
+# =============================================================================
+
+# Let the reverse proxy stream large result files instead of the Flask worker.
+#   None     -> Flask sends the file itself (default, no proxy needed)
+#   'nginx'  -> X-Accel-Redirect to XSENDFILE_INTERNAL_PREFIX, e.g.
+#               location /_internal/msa/ { internal; alias <MSA_DIR>/; }
+#               location /_internal/output/ { internal; alias <OUTPUT_DIR>/; }
+#   'apache' -> X-Sendfile with the absolute path (requires mod_xsendfile)
+XSENDFILE_MODE = None
+XSENDFILE_INTERNAL_PREFIX = "/_internal"
+
 # =============================================================================
 # DATABASE ACTIONS (UPDATED - All use rejection!)
 # =============================================================================
 
-DATABASE_ACTIONS = {
+# The tables below are read-only views: they are looked up once per run, never modified
+def _frozen(table):
+    return MappingProxyType({key: MappingProxyType(value) for key, value in table.items()})
+
+DATABASE_ACTIONS = _frozen({
     'human': {
         'action': 'reject',
         'selection': 'negative',  # Reject matches (remove human-like)
@@ -159,13 +220,13 @@ DATABASE_ACTIONS = {
         'selection': 'positive',
         'description': 'Keep only drug target proteins'
     },
-}
+})
 
 # =============================================================================
 # PIPELINE FLOW
 # =============================================================================
 
-PIPELINE_FLOW = {
+PIPELINE_FLOW = _frozen({
     'human': {
         'input_source': 'combined',
         'next_step': 'deg'
@@ -182,7 +243,7 @@ PIPELINE_FLOW = {
         'input_source': 'vfdb',
         'next_step': None
     },
-}
+})
 
 # =============================================================================
 # VALIDATION
@@ -226,9 +287,19 @@ def validate_config():
         ('ESKAPE', ESKAPE_DB),
     ]
     
+    # One directory listing per DB folder instead of a stat() per index extension
+    dir_entries = {}
     for name, db_path in databases:
         extensions = ['.phr', '.pin', '.psq']
-        found = any((Path(str(db_path) + ext).exists()) for ext in extensions)
+        entries = dir_entries.get(db_path.parent)
+        if entries is None:
+            try:
+                with os.scandir(db_path.parent) as it:
+                    entries = {entry.name for entry in it}
+            except OSError:
+                entries = set()
+            dir_entries[db_path.parent] = entries
+        found = any(f"{db_path.name}{ext}" in entries for ext in extensions)
         
         if found:
             print(f"  ✓ {name}: {db_path}")
@@ -8,11 +8,29 @@ import subprocess
 import sys
 import os
 import argparse
+from collections import Counter
 from pathlib import Path
+from xml.sax.saxutils import escape
+import matplotlib
+matplotlib.use('Agg')  # file output only; no GUI backend probing
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from matplotlib.patches import FancyBboxPatch, FancyArrow
+from matplotlib.patches import FancyBboxPatch
 import numpy as np
+# Parsing and drawing helpers shared with the standalone visualizer
+from ss_visualizer import (parse_ss2_file, structure_segments, strand_polygons,
+                           draw_structure, draw_label_row)
+
+# Coarser path simplification (merge segments deviating < 1 px) for the sampled helix curves
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
+plt.rcParams['agg.path.chunksize'] = 10000
+
+# Longer proteins rendered to .svg skip matplotlib (see write_structure_svg)
+SVG_DIRECT_MIN_RESIDUES = 2000
+
+# Default location of the s4pred predictor, resolved once at import
+DEFAULT_S4PRED_PATH = str(Path(__file__).resolve().parent.parent / 'db' / 's4pred' / 'run_model.py')
 
 
 def run_s4pred(input_fasta, output_ss2, s4pred_path):
@@ -38,12 +56,14 @@ def run_s4pred(input_fasta, output_ss2, s4pred_path):
     cmd = [sys.executable, str(s4pred_path), str(input_fasta)]
     print(f"Running command: {' '.join(cmd)}")
     
+    # s4pred's stdout goes straight into a temp file beside the output (no copy held in
+    # memory), which replaces output_ss2 only once the prediction has succeeded
+    output_ss2 = Path(output_ss2)
+    tmp_ss2 = output_ss2.with_name(f".{output_ss2.name}.{os.getpid()}.tmp")
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        # Write output to ss2 file
-        with open(output_ss2, 'w') as f:
-            f.write(result.stdout)
+        with open(tmp_ss2, 'wb') as f:
+            subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True, check=True)
+        os.replace(tmp_ss2, output_ss2)
         
         print(f"✓ Prediction complete! Output saved to: {output_ss2}")
         return True
@@ -52,84 +72,112 @@ def run_s4pred(input_fasta, output_ss2, s4pred_path):
         print(f"✗ Error running s4pred:")
         print(f"  {e.stderr}")
         return False
+    finally:
+        if tmp_ss2.exists():
+            tmp_ss2.unlink()
 
 
-def parse_ss2_file(filename):
-    """Parse PSIPRED .ss2 file and extract sequence and structure"""
-    sequence = []
-    structure = []
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Skip comments and empty lines
-            if line.startswith('#') or not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) >= 3:
-                # Format: position amino_acid structure confidence1 confidence2 confidence3
-                pos = parts[0]
-                aa = parts[1]
-                ss = parts[2]
-                
-                sequence.append(aa)
-                structure.append(ss)
-    
-    return sequence, structure
+def helix_svg_path(x0, x1, y, amplitude, n_turns):
+    """SVG path data for a helix wave: one quadratic Bezier per half-turn, continued with T"""
+    half = (x1 - x0) / (2 * n_turns)
+    steps = ''.join(f"T{x0 + half * k:.1f},{y:.1f}" for k in range(2, 2 * n_turns + 1))
+    # A quadratic's apex lies halfway to its control point, hence 2 * amplitude
+    return f"M{x0:.1f},{y:.1f}Q{x0 + half / 2:.1f},{y - 2 * amplitude:.1f} {x0 + half:.1f},{y:.1f}{steps}"
 
 
-def draw_helix(ax, start_x, end_x, y, height=0.4, n_turns=None):
-    """Draw a helix representation"""
-    length = end_x - start_x
-    
-    # Calculate number of turns based on length
-    if n_turns is None:
-        n_turns = max(2, int(length / 1.5))
-    
-    # Generate helix curve
-    t = np.linspace(0, n_turns * 2 * np.pi, 200)
-    x = np.linspace(start_x, end_x, 200)
-    y_curve = y + height * 0.5 * np.sin(t)
-    
-    # Draw the helix with thicker line
-    ax.plot(x, y_curve, 'r-', linewidth=5, solid_capstyle='round')
-    
-    # Add shading to give 3D effect
-    ax.fill_between(x, y_curve - 0.1, y_curve + 0.1, alpha=0.3, color='red')
+def write_structure_svg(sequence, structure, output_file, font_size=10, font_weight='normal'):
+    """
+    Write the visualization as SVG markup built directly, without matplotlib.
+    Used for very long proteins, where building and saving the figure dominates.
+    Follows the matplotlib layout (0.4 in per residue, 6 in tall); helices are smooth
+    Bezier waves instead of sampled sine curves.
+    """
+    unit_width = 0.8
+    fig_height = 6
+    y_center = fig_height / 2
+    sx = 0.4 * 72 / unit_width  # pt per data unit along x
+    sy = 72.0                   # pt per data unit along y
+    width = (len(sequence) + 1) * unit_width * sx
+    height = fig_height * sy
 
+    def X(x):
+        return (x + 0.5 * unit_width) * sx
 
-def draw_strand(ax, start_x, end_x, y, height=0.3):
-    """Draw a beta-strand as an arrow"""
-    arrow_width = height
-    arrow_length = end_x - start_x
-    
-    # Draw the arrow (beta-strand)
-    arrow = FancyArrow(start_x, y, arrow_length * 0.85, 0, 
-                       width=arrow_width,
-                       head_width=arrow_width * 1.6,
-                       head_length=arrow_length * 0.15,
-                       fc='gold', ec='orange', linewidth=2,
-                       length_includes_head=True)
-    ax.add_patch(arrow)
+    def Y(y):
+        return (fig_height - y) * sy
+
+    shading, lines, strand_bounds = [], [], []
+    for ss_type, start_idx, end_idx in structure_segments(structure):
+        start_x = start_idx * unit_width
+        end_x = (end_idx + 1) * unit_width
+        if ss_type == 'H':
+            length = end_x - start_x
+            d = helix_svg_path(X(start_x), X(end_x), Y(y_center), 0.3 * sy, max(2, int(length / 1.5)))
+            lines.append(f'<path d="{d}" stroke="red" stroke-width="5"/>')
+            if length * 15 >= 64:  # same cut-off as the matplotlib shading
+                shading.append(f'<path d="{d}"/>')
+        elif ss_type == 'E':
+            strand_bounds.append((start_x, end_x))
+        else:  # 'C' or coil
+            lines.append(f'<path d="M{X(start_x):.1f},{Y(y_center):.1f}H{X(end_x):.1f}" stroke="gray" stroke-width="4"/>')
 
+    strands = []
+    if strand_bounds:
+        strand_x = np.array(strand_bounds)
+        for poly in strand_polygons(strand_x[:, 0], strand_x[:, 1], y_center, height=0.5, head_scale=1.6):
+            points = ' '.join(f"{X(x):.1f},{Y(y):.1f}" for x, y in poly)
+            strands.append(f'<polygon points="{points}"/>')
 
-def draw_coil(ax, start_x, end_x, y, height=0.1):
-    """Draw a coil/loop as a line"""
-    ax.plot([start_x, end_x], [y, y], 'gray', linewidth=4, solid_capstyle='round')
+    label_xs = ' '.join(f"{X(i * unit_width + unit_width / 2):.1f}" for i in range(len(sequence)))
+    number_y = Y(y_center + 1.2)
+    numbers = [f'<text x="{X(i * unit_width + unit_width / 2):.1f}" y="{number_y:.1f}">{i + 1}</text>'
+               for i in range(len(sequence)) if (i + 1) % 10 == 0 or i == 0]
+    legend = [f'<rect x="10" y="{height - 62 + 20 * row:.1f}" width="28" height="10" fill="{color}"/>'
+              f'<text x="46" y="{height - 52 + 20 * row:.1f}">{label}</text>'
+              for row, (color, label) in enumerate((('red', 'Alpha-Helix (H)'), ('gold', 'Beta-Strand (E)'),
+                                                    ('gray', 'Coil (C)')))]
+
+    # Per-glyph x positions keep every residue letter centered on its column, as in the PNG
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.1f}pt" height="{height:.1f}pt" '
+        f'viewBox="0 0 {width:.1f} {height:.1f}">\n'
+        f'<rect width="100%" height="100%" fill="white"/>\n'
+        f'<g fill="none" stroke="red" stroke-opacity="0.3" stroke-width="{0.2 * sy:.1f}">{"".join(shading)}</g>\n'
+        f'<g fill="gold" stroke="orange" stroke-width="2">{"".join(strands)}</g>\n'
+        f'<g fill="none" stroke-linecap="round" stroke-linejoin="round">{"".join(lines)}</g>\n'
+        f'<text x="{label_xs}" y="{Y(y_center - 1.2):.1f}" font-family="monospace" font-size="{font_size}" '
+        f'font-weight="{font_weight}" text-anchor="middle" dominant-baseline="hanging">{escape("".join(sequence))}</text>\n'
+        f'<g font-family="sans-serif" font-size="{font_size - 2}" fill="gray" '
+        f'text-anchor="middle" dominant-baseline="text-after-edge">{"".join(numbers)}</g>\n'
+        f'<g font-family="sans-serif" font-size="10">'
+        f'<text x="10" y="{height - 96:.1f}">Note: The highlighted sequence is the selected reference.</text>'
+        f'<text x="10" y="{height - 74:.1f}">Structure Legend:</text>{"".join(legend)}</g>\n'
+        '</svg>\n'
+    )
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(svg)
 
 
 def visualize_secondary_structure(sequence, structure, output_file='secondary_structure_viz.png', 
-                                 font_size=10, font_weight='normal'):
-    """Create visualization of secondary structure"""
+                                 font_size=10, font_weight='normal', verbose=False):
+    """Create visualization of secondary structure (verbose prints the full structure string)"""
     
     print(f"\n{'='*60}")
     print("STEP 2: Creating Visualization")
     print(f"{'='*60}")
     print(f"Sequence length: {len(sequence)}")
-    print(f"Structure: {''.join(structure)}")
+    if verbose or len(structure) <= 60:
+        print(f"Structure: {''.join(structure)}")
+    else:
+        # Long proteins would flood the job log; the first 60 states are enough context
+        print(f"Structure: {''.join(structure[:60])}... ({len(structure)} residues)")
     print(f"Font settings: size={font_size}, weight={font_weight}")
 
+    if len(sequence) > SVG_DIRECT_MIN_RESIDUES and str(output_file).endswith('.svg'):
+        write_structure_svg(sequence, structure, output_file, font_size, font_weight)
+        print(f"✓ Visualization saved to: {output_file}")
+        return
+
     # --- MODIFICATION: Revert to a single long row instead of wrapping ---
     unit_width = 0.8 # Keep the tighter spacing for better alignment with MSA text
     fig_width = len(sequence) * 0.5 * unit_width # Calculate width based on full sequence length
@@ -141,42 +189,22 @@ def visualize_secondary_structure(sequence, structure, output_file='secondary_st
     y_center = fig_height / 2 # Center the visualization vertically
 
     # Group consecutive same structures for the entire sequence
-    segments = []
-    if structure:
-        current_type = structure[0]
-        start_idx = 0
-        for i in range(1, len(structure)):
-            if structure[i] != current_type:
-                segments.append((current_type, start_idx, i - 1))
-                current_type = structure[i]
-                start_idx = i
-        segments.append((current_type, start_idx, len(structure) - 1))
-
-    # Draw each segment
-    for ss_type, start_idx, end_idx in segments:
-        start_x = start_idx * unit_width
-        end_x = (end_idx + 1) * unit_width
-        
-        if ss_type == 'H':
-            draw_helix(ax, start_x, end_x, y_center, height=0.6) # MODIFICATION: Increased height
-        elif ss_type == 'E':
-            draw_strand(ax, start_x, end_x, y_center, height=0.5) # MODIFICATION: Increased height
-        else:  # 'C' or coil
-            draw_coil(ax, start_x, end_x, y_center)
+    segments = structure_segments(structure)
 
-    # Add amino acid labels and position numbers
-    for i, aa in enumerate(sequence):
-        x = i * unit_width + unit_width / 2
-        pos = i + 1
-        
-        # Add amino acid label
-        ax.text(x, y_center - 1.2, aa, ha='center', va='top', # MODIFICATION: Increased vertical offset
-                fontsize=font_size, family='monospace', weight=font_weight)
-        
-        # Add position number every 10 residues
-        if pos % 10 == 0 or pos == 1:
-            ax.text(x, y_center + 1.2, str(pos), ha='center', va='bottom', # MODIFICATION: Increased vertical offset
-                    fontsize=font_size - 2, family='sans-serif', color='gray')
+    # Draw all segments (one artist per element kind)
+    draw_structure(ax, segments, unit_width, y_center,
+                   helix_height=0.6, strand_height=0.5, # MODIFICATION: Increased heights
+                   head_scale=1.6, shading_offset=0.1)
+
+    # Add amino acid labels and position numbers (one artist per row, not one per label)
+    label_x = np.arange(len(sequence)) * unit_width + unit_width / 2
+    draw_label_row(ax, label_x, y_center - 1.2, sequence, 'top', # MODIFICATION: Increased vertical offset
+                   font_size, 'monospace', font_weight)
+
+    # Add position number every 10 residues
+    numbered = [i for i in range(len(sequence)) if (i + 1) % 10 == 0 or i == 0]
+    draw_label_row(ax, label_x[numbered], y_center + 1.2, [str(i + 1) for i in numbered], 'bottom', # MODIFICATION: Increased vertical offset
+                   font_size - 2, 'sans-serif', color='gray')
     # --- END MODIFICATION ---
     
     # Set axis properties
@@ -202,11 +230,8 @@ def visualize_secondary_structure(sequence, structure, output_file='secondary_st
 
 def count_structures(structure):
     """Count helix, strand, and coil residues"""
-    counts = {'H': 0, 'E': 0, 'C': 0}
-    for ss in structure:
-        if ss in counts:
-            counts[ss] += 1
-    return counts
+    counts = Counter(structure)  # counted in C
+    return {'H': counts['H'], 'E': counts['E'], 'C': counts['C']}
 
 
 def main():
@@ -229,33 +254,36 @@ Examples:
     parser.add_argument('input_fasta', 
                         help='Input protein FASTA file')
     parser.add_argument('--s4pred', 
-                        default=str(Path(__file__).parent.parent / 'db' / 's4pred' / 'run_model.py'),
+                        default=DEFAULT_S4PRED_PATH,
                         help='Path to s4pred run_model.py script')
     parser.add_argument('--ss2', 
                         help='Output .ss2 file (default: input_basename.ss2)')
     parser.add_argument('--output', '-o',
-                        help='Output visualization PNG file (default: input_basename_viz.png)')
+                        help='Output visualization PNG file, or .svg (default: input_basename_viz.png)')
     parser.add_argument('--font-size', type=int, default=10,
                         help='Font size for amino acid labels (default: 8)')
     parser.add_argument('--font-weight', default='normal',
                         help='Font weight: normal, bold, light, or numeric 100-900 (default: normal)')
     parser.add_argument('--no-viz', action='store_true',
                         help='Skip visualization step (only run prediction)')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Print the full predicted structure string')
     
     args = parser.parse_args()
     
     input_path = Path(args.input_fasta).resolve()
     
     # If output paths are not provided, derive them from the input file name.
+    input_stem = input_path.with_suffix('')
     if args.ss2:
         ss2_file = Path(args.ss2)
     else:
-        ss2_file = input_path.with_suffix('.ss2')
+        ss2_file = Path(f"{input_stem}.ss2")
     
     if args.output:
         viz_file = Path(args.output)
     else:
-        viz_file = input_path.with_suffix('.png')
+        viz_file = Path(f"{input_stem}.png")
     
     print("\n" + "="*60)
     print("PROTEIN SECONDARY STRUCTURE PREDICTION & VISUALIZATION")
@@ -267,7 +295,7 @@ Examples:
     
     try:
         # Step 1: Run prediction
-        success = run_s4pred(args.input_fasta, ss2_file, args.s4pred)
+        success = run_s4pred(input_path, ss2_file, args.s4pred)
         
         if not success:
             print("\n✗ Pipeline failed at prediction step")
@@ -282,7 +310,7 @@ Examples:
                 sys.exit(1)
             
             visualize_secondary_structure(sequence, structure, viz_file, 
-                                        args.font_size, args.font_weight)
+                                        args.font_size, args.font_weight, args.verbose)
             
             # Print summary statistics
             counts = count_structures(structure)
@@ -4,71 +4,170 @@ Protein Secondary Structure Visualization
 Visualizes PSIPRED output showing helices, coils, and beta-strands
 """
 
+import matplotlib
+matplotlib.use('Agg')  # file output only; no GUI backend probing
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from matplotlib.patches import FancyBboxPatch, FancyArrow
+from matplotlib.patches import FancyBboxPatch
 import numpy as np
+import warnings
+from matplotlib.collections import LineCollection, PathCollection, PolyCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextPath, text_to_path
+from matplotlib.transforms import IdentityTransform
+
+# Coarser path simplification (merge segments deviating < 1 px) for the sampled helix curves
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
+plt.rcParams['agg.path.chunksize'] = 10000
 
 def parse_ss2_file(filename):
     """Parse PSIPRED .ss2 file and extract sequence and structure"""
-    sequence = []
-    structure = []
-    
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # "input contained no data" for empty files
+            # C-level tokenizer; ndmin=2 keeps single-residue files two-dimensional
+            columns = np.loadtxt(filename, comments='#', usecols=(1, 2), dtype=str, ndmin=2)
+    except ValueError:
+        # Rows with fewer than 3 columns: fall back to the tolerant line-by-line parser
+        return parse_ss2_lines(filename)
+    return columns[:, 0].tolist(), columns[:, 1].tolist()
+
+def parse_ss2_lines(filename):
+    """Parse a .ss2 file line by line, skipping rows with fewer than 3 columns"""
     with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Skip comments and empty lines
-            if line.startswith('#') or not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) >= 3:
-                # Format: position amino_acid structure confidence1 confidence2 confidence3
-                pos = parts[0]
-                aa = parts[1]
-                ss = parts[2]
-                
-                sequence.append(aa)
-                structure.append(ss)
+        # Format: position amino_acid structure confidence1 confidence2 confidence3
+        # (comment lines start with '#'; empty lines split to no fields)
+        rows = [parts for parts in map(str.split, f) if len(parts) >= 3 and not parts[0].startswith('#')]
     
-    return sequence, structure
+    # Columns are pulled out with comprehensions instead of two appends per row
+    return [parts[1] for parts in rows], [parts[2] for parts in rows]
 
-def draw_helix(ax, start_x, end_x, y, height=0.4, n_turns=None):
-    """Draw a helix representation"""
+def helix_curve(start_x, end_x, y, height=0.4, n_turns=None):
+    """Sample the helix curve of one segment; returns (x, y_curve)"""
     length = end_x - start_x
     
     # Calculate number of turns based on length
     if n_turns is None:
         n_turns = max(2, int(length / 1.5))
     
-    # Generate helix curve
-    t = np.linspace(0, n_turns * 2 * np.pi, 200)
-    x = np.linspace(start_x, end_x, 200)
-    y_curve = y + height * 0.5 * np.sin(t)
-    
-    # Draw the helix with thicker line
-    ax.plot(x, y_curve, 'r-', linewidth=5, solid_capstyle='round')
-    
-    # Add shading to give 3D effect
-    ax.fill_between(x, y_curve - 0.08, y_curve + 0.08, alpha=0.3, color='red')
+    # Generate helix curve, sampled in proportion to the segment length (>= 16 points per turn)
+    n_samples = max(32, int(length * 15))
+    t = np.linspace(0, n_turns * 2 * np.pi, n_samples)
+    x = np.linspace(start_x, end_x, n_samples)
+    return x, y + height * 0.5 * np.sin(t)
 
-def draw_strand(ax, start_x, end_x, y, height=0.3):
-    """Draw a beta-strand as an arrow"""
-    arrow_width = height
-    arrow_length = end_x - start_x
-    
-    # Draw the arrow (beta-strand)
-    arrow = FancyArrow(start_x, y, arrow_length * 0.85, 0, 
-                       width=arrow_width, 
-                       head_width=arrow_width * 1.8, 
-                       head_length=arrow_length * 0.15,
-                       fc='gold', ec='orange', linewidth=2,
-                       length_includes_head=True)
-    ax.add_patch(arrow)
+def strand_polygons(start_x, end_x, y, height=0.3, head_scale=1.8):
+    """
+    Build the arrow outlines of beta-strands from arrays of segment bounds; returns an
+    (N, 7, 2) vertex array. Same shape as the former FancyArrow patch: the arrow spans
+    85% of the segment, the last 15% of the segment length being the head, which is
+    head_scale times as wide as the shaft.
+    """
+    start_x = np.asarray(start_x, dtype=float)
+    length = np.asarray(end_x, dtype=float) - start_x
+    tip_x = start_x + length * 0.85
+    head_x = tip_x - length * 0.15
+    half_width = height / 2
+    half_head = height * head_scale / 2
+    xs = np.column_stack([tip_x, head_x, head_x, start_x, start_x, head_x, head_x])
+    ys = np.broadcast_to(y + np.array([0, -half_head, -half_width, -half_width,
+                                       half_width, half_width, half_head]), xs.shape)
+    return np.stack([xs, ys], axis=-1)
 
-def draw_coil(ax, start_x, end_x, y, height=0.1):
-    """Draw a coil/loop as a line"""
-    ax.plot([start_x, end_x], [y, y], 'gray', linewidth=4, solid_capstyle='round')
+def draw_structure(ax, segments, unit_width, y, helix_height=0.4, strand_height=0.3,
+                   head_scale=1.8, shading_offset=0.08):
+    """
+    Draw (type, start_idx, end_idx) segments with one artist per element kind instead
+    of one per segment: a LineCollection for helix and coil lines (kept in sequence
+    order so overlapping round caps stack as before), one fill_between call for the
+    helix shading (shading_offset above and below the curve), and a PolyCollection
+    for the strand arrows (head_scale as in strand_polygons).
+    """
+    lines, line_colors, line_widths = [], [], []
+    shade_x, shade_y, shade_where = [], [], []
+    strand_bounds = []
+    for ss_type, start_idx, end_idx in segments:
+        start_x = start_idx * unit_width
+        end_x = (end_idx + 1) * unit_width
+        
+        if ss_type == 'H':
+            x, y_curve = helix_curve(start_x, end_x, y, height=helix_height)
+            lines.append(np.column_stack([x, y_curve]))
+            line_colors.append('red')
+            line_widths.append(5)
+            # Shading gives a 3D effect (not visible on very short helices); a False
+            # point between helices keeps their fill polygons separate
+            if len(x) >= 64:
+                shade_x += [x, x[-1:]]
+                shade_y += [y_curve, y_curve[-1:]]
+                shade_where += [np.ones(len(x), dtype=bool), [False]]
+        elif ss_type == 'E':
+            strand_bounds.append((start_x, end_x))
+        else:  # 'C' or coil
+            lines.append([(start_x, y), (end_x, y)])
+            line_colors.append('gray')
+            line_widths.append(4)
+
+    if shade_x:
+        shade_x = np.concatenate(shade_x)
+        shade_y = np.concatenate(shade_y)
+        ax.fill_between(shade_x, shade_y - shading_offset, shade_y + shading_offset, where=np.concatenate(shade_where),
+                        alpha=0.3, color='red')
+    if strand_bounds:
+        strand_x = np.array(strand_bounds)
+        ax.add_collection(PolyCollection(strand_polygons(strand_x[:, 0], strand_x[:, 1], y, height=strand_height,
+                                                         head_scale=head_scale),
+                                         facecolors='gold', edgecolors='orange', linewidths=2,
+                                         joinstyle='miter'))
+    if lines:
+        ax.add_collection(LineCollection(lines, colors=line_colors, linewidths=line_widths,
+                                         capstyle='round', joinstyle='round'))
+
+def structure_segments(structure):
+    """Run-length encode a structure string/list into (type, start_idx, end_idx) segments"""
+    if not len(structure):
+        return []
+    joined = ''.join(structure)
+    if len(joined) == len(structure):
+        # One code point per state: view the UTF-32 bytes as integers, with no per-item conversion
+        codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+    else:
+        codes = np.asarray(list(structure), dtype='U1')
+    # Indices where the structure type changes, found with one vectorized comparison
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.concatenate(([0], boundaries)).tolist()
+    ends = np.concatenate((boundaries - 1, [len(codes) - 1])).tolist()
+    return [(structure[start][:1], start, end) for start, end in zip(starts, ends)]
+
+def draw_label_row(ax, xs, y, labels, va, font_size, family, font_weight='normal', color='black'):
+    """
+    Draw short labels centered at data x positions as a single PathCollection.
+    Each distinct label is turned into glyph outlines once (TextPath, in points) and
+    placed like ax.text(ha='center', va=va) would; one artist replaces one Text per
+    residue, which dominated savefig time for long proteins.
+    """
+    if not len(labels):
+        return
+    prop = FontProperties(family=family, size=font_size, weight=font_weight)
+    # Text aligns 'top'/'bottom' on the line box, whose metrics matplotlib takes from "lp"
+    _, line_height, line_descent = text_to_path.get_text_width_height_descent('lp', prop, ismath=False)
+    baseline = -(line_height - line_descent) if va == 'top' else line_descent
+
+    glyphs = {}
+    paths = []
+    for label in labels:
+        path = glyphs.get(label)
+        if path is None:
+            width, _, _ = text_to_path.get_text_width_height_descent(label, prop, ismath=False)
+            path = glyphs[label] = TextPath((-width / 2, baseline), label, prop=prop)
+        paths.append(path)
+
+    # sizes=[1] makes the collection scale path units as points, like scatter markers
+    labels_artist = PathCollection(paths, sizes=[1.0], offsets=np.column_stack([xs, np.full(len(xs), y)]),
+                                   offset_transform=ax.transData, facecolors=color, edgecolors='none')
+    labels_artist.set_transform(IdentityTransform())
+    ax.add_collection(labels_artist, autolim=False)
 
 def visualize_secondary_structure(sequence, structure, output_file='secondary_structure_viz.png', 
                                  font_size=8, font_weight='normal'):
@@ -90,37 +189,16 @@ def visualize_secondary_structure(sequence, structure, output_file='secondary_st
     unit_width = 1.0
     
     # Group consecutive same structures
-    segments = []
-    if structure:
-        current_type = structure[0]
-        start_idx = 0
-        
-        for i in range(1, len(structure)):
-            if structure[i] != current_type:
-                segments.append((current_type, start_idx, i - 1))
-                current_type = structure[i]
-                start_idx = i
-        
-        # Add last segment
-        segments.append((current_type, start_idx, len(structure) - 1))
+    segments = structure_segments(structure)
     
-    # Draw each segment
-    for ss_type, start_idx, end_idx in segments:
-        start_x = start_idx * unit_width
-        end_x = (end_idx + 1) * unit_width
-        
-        if ss_type == 'H':
-            draw_helix(ax, start_x, end_x, y_center)
-        elif ss_type == 'E':
-            draw_strand(ax, start_x, end_x, y_center)
-        else:  # 'C' or coil
-            draw_coil(ax, start_x, end_x, y_center)
+    # Draw all segments (one artist per element kind)
+    draw_structure(ax, segments, unit_width, y_center)
     
-    # Add amino acid labels below
-    for i, (aa, ss) in enumerate(zip(sequence, structure)):
-        x = i * unit_width + unit_width / 2
-        ax.text(x, y_center - 0.6, aa, ha='center', va='top', 
-                fontsize=font_size, family='monospace', weight=font_weight)
+    # Add amino acid labels below (a single artist for the whole row)
+    n_labels = min(len(sequence), len(structure))
+    label_x = np.arange(n_labels) * unit_width + unit_width / 2
+    draw_label_row(ax, label_x, y_center - 0.6, sequence[:n_labels], 'top',
+                   font_size, 'monospace', font_weight)
     
     # Set axis properties
     ax.set_xlim(-0.5, len(sequence) * unit_width + 0.5)
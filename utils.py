@@ -1,10 +1,406 @@
+import os
 import re
+import csv
+import json
+import tempfile
+from pathlib import Path
+from functools import lru_cache
 
+# Legacy sanitization table that matches currently generated files:
+# '/' and ' ' become '_', while '(', ')', ',' and "'" are dropped
+_SANITIZE_TABLE = str.maketrans({'/': '_', '(': None, ')': None, ',': None, ' ': '_', "'": None})
+
+@lru_cache(maxsize=8192)
 def sanitize_protein_name(protein_name: str) -> str:
     """
     Sanitizes a protein name to create a safe and consistent filename component.
     Matches legacy file naming convention to ensure existing files are found.
+    Results are memoized since the same names are sanitized on every page load.
+    """
+    # This preserves '=', '[', ']', and creates multiple underscores '___' which exist in the filenames.
+    # One str.translate pass gives the same result as the former chain of six str.replace calls.
+    return protein_name.translate(_SANITIZE_TABLE)
+
+
+def _scan_fasta_records(fasta_path, chunk_size):
+    """
+    The single FASTA record scanner behind iter_fasta_records and iter_fasta_record_spans.
+    Yields (buffer, start, end, buffer_offset): the record is buffer[start:end] and
+    buffer[0] sits at file offset buffer_offset. The file is read in large binary chunks
+    and split on b'\\n>' so records are found with C-level scans instead of per-line
+    Python work. Any text before the first header is skipped.
+    """
+    buffer = b''
+    buffer_offset = 0  # file offset of buffer[0]
+    with open(fasta_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            # Only the bytes appended since the last scan (plus one for a split b'\n>') are new
+            scan_from = max(len(buffer) - 1, 0)
+            buffer += chunk
+            start = 0
+            while True:
+                boundary = buffer.find(b'\n>', max(start, scan_from))
+                if boundary == -1:
+                    break
+                if buffer.startswith(b'>', start):
+                    yield buffer, start, boundary + 1, buffer_offset
+                start = boundary + 1
+            buffer = buffer[start:]
+            buffer_offset += start
+
+    if buffer.startswith(b'>'):
+        yield buffer, 0, len(buffer), buffer_offset
+
+
+def _record_header(buffer, start, end):
+    header_end = buffer.find(b'\n', start, end)
+    return buffer[start:header_end if header_end != -1 else end].rstrip(b'\r')
+
+
+def iter_fasta_records(fasta_path, chunk_size=4 * 1024 * 1024, headers_only=False):
+    """
+    Yields (header, record) byte strings for every record in a FASTA file.
+    `header` is the '>' line without its line ending, `record` is the full record
+    text (header plus sequence lines) exactly as stored in the file.
+    With headers_only=True, `record` is None and sequence bodies are never copied.
+    """
+    for buffer, start, end, _ in _scan_fasta_records(fasta_path, chunk_size):
+        yield _record_header(buffer, start, end), None if headers_only else buffer[start:end]
+
+
+def split_fasta_header(header):
+    """
+    Splits a FASTA header line (bytes, including the leading '>') into its
+    sequence ID and the description that follows the first space.
+    """
+    header_id, _, description = header[1:].partition(b' ')
+    if not header_id or b'\t' in header_id:
+        # Uncommon layouts (leading space, tab after the ID): split on any whitespace instead
+        fields = header[1:].split(None, 1)
+        header_id = fields[0] if fields else b''
+    return header_id, description.strip()
+
+
+def get_sequence_lengths(fasta_path):
+    """
+    Returns {sequence ID: residue count} for every record of a FASTA file.
+    The ID is the header text up to the first whitespace, matching BLAST's qseqid.
+    Lengths are taken from the raw record bytes with one C-level translate per
+    record instead of per-line Python work.
+    """
+    lengths = {}
+    for header, record in iter_fasta_records(fasta_path):
+        seq_id, _ = split_fasta_header(header)
+        header_end = record.find(b'\n')
+        body = record[header_end + 1:] if header_end != -1 else b''
+        lengths[seq_id.decode('utf-8', errors='replace')] = len(body.translate(None, b' \t\r\n'))
+    return lengths
+
+
+def extract_sequences_by_id(input_fasta, seq_ids, output_fasta):
+    """
+    Writes the records of input_fasta whose ID is in seq_ids to output_fasta,
+    in input order and byte-for-byte as stored. Returns the number written.
+    A first pass only collects the byte ranges of the wanted records (merging
+    neighbours); the ranges are then copied with os.sendfile where available.
+    """
+    wanted = {seq_id.encode('utf-8') for seq_id in seq_ids}
+    ranges = []
+    written = 0
+    for header, start, end in iter_fasta_record_spans(input_fasta):
+        if split_fasta_header(header)[0] in wanted:
+            written += 1
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+
+    with open(input_fasta, 'rb') as src, open(output_fasta, 'wb', buffering=0) as out:
+        for start, end in ranges:
+            _copy_byte_range(src, out, start, end - start)
+        # Only a record at the very end of the input can lack its trailing newline
+        if ranges:
+            src.seek(ranges[-1][1] - 1)
+            if src.read(1) != b'\n':
+                out.write(b'\n')
+    return written
+
+
+def iter_fasta_record_spans(fasta_path, chunk_size=4 * 1024 * 1024):
+    """
+    Like iter_fasta_records(headers_only=True), but yields (header, start, end)
+    where start/end are the record's byte offsets in the file.
+    """
+    for buffer, start, end, buffer_offset in _scan_fasta_records(fasta_path, chunk_size):
+        yield _record_header(buffer, start, end), buffer_offset + start, buffer_offset + end
+
+
+def _copy_byte_range(src, out, offset, count):
+    """Copies count bytes at offset of file src to the unbuffered file out, in the kernel if possible."""
+    if hasattr(os, 'sendfile'):
+        end = offset + count
+        while offset < end:
+            sent = os.sendfile(out.fileno(), src.fileno(), offset, end - offset)
+            if not sent:
+                break
+            offset += sent
+    else:
+        src.seek(offset)
+        while count > 0:
+            data = src.read(min(count, 1024 * 1024))
+            if not data:
+                break
+            out.write(data)
+            count -= len(data)
+
+
+def count_fasta_records(fasta_path, chunk_size=8 * 1024 * 1024):
+    """
+    Counts the '>' header lines of a FASTA file. The file is read in large binary
+    chunks and searched with bytes.count, which runs in C instead of iterating
+    lines in Python.
+    """
+    count = 0
+    previous_last = b'\n'  # the start of the file counts as a line start
+    with open(fasta_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            count += chunk.count(b'\n>')
+            # A '\n' ending the previous chunk and a '>' starting this one
+            if previous_last == b'\n' and chunk[:1] == b'>':
+                count += 1
+            previous_last = chunk[-1:]
+    return count
+
+
+def cached_fasta_record_count(fasta_path):
+    """
+    Returns count_fasta_records(fasta_path), reusing the count stored in a hidden
+    '.<name>.count' sidecar while the file's mtime and size are unchanged.
+    The sidecar is rewritten atomically; failing to write it is not an error.
+    """
+    fasta_path = Path(fasta_path)
+    sidecar = fasta_path.with_name(f".{fasta_path.name}.count")
+    stat = fasta_path.stat()
+    cached = _read_record_count_sidecar(sidecar, stat)
+    if cached is not None:
+        return cached['count']
+
+    count = count_fasta_records(fasta_path)
+    _write_record_count_sidecar(sidecar, stat, count)
+    return count
+
+
+def cached_fasta_residue_total(fasta_path, min_length=0, max_length=None):
+    """
+    Returns the total residue count of the records whose length is within
+    [min_length, max_length], kept in the same '.<name>.count' sidecar as the record
+    count (one entry per length range), so repeated dry runs don't rescan the file.
+    """
+    fasta_path = Path(fasta_path)
+    sidecar = fasta_path.with_name(f".{fasta_path.name}.count")
+    stat = fasta_path.stat()
+    range_key = f"{min_length}-{'' if max_length is None else max_length}"
+    cached = _read_record_count_sidecar(sidecar, stat)
+    residues = dict(cached.get('residues') or {}) if cached is not None else {}
+    if range_key in residues:
+        return residues[range_key]
+
+    count = total = 0
+    for _, record in iter_fasta_records(fasta_path):
+        count += 1
+        header_end = record.find(b'\n')
+        length = len(record[header_end + 1:].translate(None, b' \t\r\n')) if header_end != -1 else 0
+        if length >= min_length and (max_length is None or length <= max_length):
+            total += length
+    residues[range_key] = total
+    _write_record_count_sidecar(sidecar, stat, count, residues)
+    return total
+
+
+def save_fasta_record_count(fasta_path, count):
+    """
+    Records the known record count of a FASTA file that was just written, so a later
+    cached_fasta_record_count() call does not have to scan it.
+    """
+    fasta_path = Path(fasta_path)
+    _write_record_count_sidecar(fasta_path.with_name(f".{fasta_path.name}.count"), fasta_path.stat(), count)
+
+
+def _read_record_count_sidecar(sidecar, stat):
+    """Returns the sidecar's contents if it still describes the file with this stat, else None."""
+    try:
+        cached = json.loads(sidecar.read_bytes())
+        if cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size and 'count' in cached:
+            return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _umask_file_mode():
+    # os.umask can only be read by setting it; done once at import, before any threads start
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Mode a plainly created file gets. tempfile.mkstemp creates 0600 files, which os.replace
+# would carry over to the target, so temp files for atomic rewrites are chmod'ed to this.
+DEFAULT_FILE_MODE = _umask_file_mode()
+
+
+def _write_record_count_sidecar(sidecar, stat, count, residues=None):
+    data = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'count': count}
+    if residues:
+        data['residues'] = residues
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=sidecar.parent, prefix=sidecar.name, suffix='.tmp')
+        os.fchmod(fd, DEFAULT_FILE_MODE)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        # e.g. disk full: don't leave the half-written temp file behind
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def count_lines(file_path, chunk_size=8 * 1024 * 1024):
+    """
+    Counts the lines of a text file (a last line without a trailing newline
+    included) by reading large binary chunks and counting b'\\n' in C.
+    """
+    count = 0
+    last = b'\n'
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            count += chunk.count(b'\n')
+            last = chunk[-1:]
+    return count if last == b'\n' else count + 1
+
+
+def combine_fasta_files(input_dir, output_file):
+    """
+    Concatenates every *.faa file in input_dir (in name order) into output_file and
+    returns the number of records written. Contents are copied with os.sendfile
+    where available, so the bytes never pass through Python; a newline is added
+    after any file that lacks a trailing one.
+    """
+    total = 0
+    with open(output_file, 'wb', buffering=0) as out:
+        for fasta_path in sorted(Path(input_dir).glob('*.faa')):
+            with open(fasta_path, 'rb') as src:
+                size = os.fstat(src.fileno()).st_size
+                if not size:
+                    continue
+                _copy_byte_range(src, out, 0, size)
+                src.seek(-1, os.SEEK_END)
+                if src.read(1) != b'\n':
+                    out.write(b'\n')
+            total += count_fasta_records(fasta_path)
+    return total
+
+
+# Column order of BLAST tabular output (-outfmt 6)
+BLAST_TABULAR_FIELDS = (
+    'qseqid', 'sseqid', 'pident', 'length', 'mismatch', 'gapopen',
+    'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore'
+)
+
+
+def parse_blast_results(blast_file):
+    """
+    Parses BLAST tabular output (-outfmt 6) into a list of hit tuples in
+    BLAST_TABULAR_FIELDS order, with the numeric columns converted.
+    Rows are split by the C-implemented csv reader; comment lines and short
+    rows are skipped, and a missing file gives an empty list.
+    """
+    hits = []
+    if not Path(blast_file).exists():
+        return hits
+
+    with open(blast_file, 'r', newline='', buffering=1024 * 1024) as f:
+        for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(row) < 12 or row[0].startswith('#'):
+                continue
+            hits.append((
+                row[0], row[1], float(row[2]), int(row[3]), int(row[4]), int(row[5]),
+                int(row[6]), int(row[7]), int(row[8]), int(row[9]), float(row[10]), float(row[11])
+            ))
+    return hits
+
+
+def filter_blast_hits(hits, query_lengths, pct_identity, coverage, evalue):
+    """
+    Applies the identity / query-coverage / e-value thresholds to parsed BLAST hits
+    (tuples or lists in BLAST_TABULAR_FIELDS order).
+    Returns (filtered_ids, hit_details): the set of query IDs with at least one
+    passing hit, and for each of them its best passing hit (highest bitscore).
+    Hits of queries missing from query_lengths are ignored. The cheap identity and
+    e-value tests run first, so most hits are rejected before the coverage division.
+    """
+    hit_details = {}
+    get_query_length = query_lengths.get
+    for qseqid, sseqid, pident, length, _, _, qstart, qend, _, _, hit_evalue, bitscore in hits:
+        if pident < pct_identity or hit_evalue > evalue:
+            continue
+        query_length = get_query_length(qseqid)
+        if not query_length:
+            continue
+        query_coverage = (abs(qend - qstart) + 1) * 100.0 / query_length
+        if query_coverage < coverage:
+            continue
+
+        best = hit_details.get(qseqid)
+        if best is None or bitscore > best['bitscore']:
+            hit_details[qseqid] = {
+                'subject': sseqid,
+                'pident': pident,
+                'length': length,
+                'coverage': round(query_coverage, 2),
+                'evalue': hit_evalue,
+                'bitscore': bitscore,
+            }
+    return set(hit_details), hit_details
+
+
+def save_filtered_results(hit_details, output_file, action='reject'):
+    """
+    Writes the best passing hit of every query (the hit_details of filter_blast_hits)
+    as a tab-separated table with one header row, in query order. The `action`
+    column records what the filter step does with these queries.
+    """
+    with open(output_file, 'w', newline='', buffering=1024 * 1024) as f:
+        writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+        writer.writerow(('query_id', 'subject_id', 'pct_identity', 'alignment_length',
+                         'query_coverage', 'evalue', 'bitscore', 'action'))
+        writer.writerows(
+            (query_id, hit['subject'], hit['pident'], hit['length'],
+             hit['coverage'], hit['evalue'], hit['bitscore'], action)
+            for query_id, hit in hit_details.items()
+        )
+
+
+def create_summary_report(output_file, step_name, stats):
+    """
+    Writes a plain-text step summary. Whitespace-only keys in stats become blank
+    separator lines. The report is built in memory and written in one call.
     """
-    # Legacy sanitization logic that matches currently generated files
-    # This preserves '=', '[', ']', and creates multiple underscores '___' which exist in the filenames
-    return protein_name.replace('/', '_').replace('(', '').replace(')', '').replace(',', '').replace(' ', '_').replace("'", "")
\ No newline at end of file
+    lines = ["=" * 70, f"{step_name} - Summary", "=" * 70]
+    for key, value in stats.items():
+        if not key.strip():
+            lines.append("")
+        elif isinstance(value, int):
+            lines.append(f"{key}: {value:,}")
+        else:
+            lines.append(f"{key}: {value}")
+    lines.append("")
+    with open(output_file, 'w') as f:
+        f.write("\n".join(lines))